@@ -0,0 +1,173 @@
+import argparse
+import json
+import platform
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .cases import CASES
+from .store import build
+
+DEFAULT_STORE_DIR = Path(__file__).parent / ".stores"
+# what scripts (and the cli, before dispatching) import
+STARTUP_MODULE = "mu_pki.api"
+# only to be imported by the commands needing them
+HEAVY_MODULES = ("cryptography.x509", "pydantic", "tomlkit", "curses", "mu_pki.menu")
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run(sizes: list[int], cases: list[str], runs: int, store_dir: Path, out: Path | None):
+    results: list[dict] = []
+    for size in sizes:
+        t = time.perf_counter()
+        build(store_dir / str(size), size)
+        print(f"--- {size} certs (store ready in {time.perf_counter() - t:.1f}s)", file=sys.stderr)
+
+        for case in cases:
+            try:
+                measured = CASES[case](size, runs)
+            except Exception as e:
+                results.append({"name": case, "size": size, "error": repr(e)})
+                print(f"{case:<32} failed: {e!r}", file=sys.stderr)
+                continue
+
+            for result in measured if isinstance(measured, list) else [measured]:
+                results.append(result.to_raw())
+                print(
+                    f"{result.name:<32} {result.per_op * 1e3:>12.3f} ms/op"
+                    f"  (median {result.median / result.ops * 1e3:.3f} ms/op, "
+                    f"{result.ops} op x {result.runs})",
+                    file=sys.stderr,
+                )
+
+    report = {
+        "commit": _commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "results": results,
+    }
+    raw = json.dumps(report, indent=2)
+    if out:
+        out.write_text(raw)
+    else:
+        print(raw)
+
+
+def compare(base: Path, head: Path, threshold: float):
+    """per-op time ratios of `head` over `base`, fails on regressions beyond the threshold"""
+    key = lambda r: (r["name"], r["size"])  # noqa: E731
+    base_results = {key(r): r for r in json.loads(base.read_text())["results"] if "error" not in r}
+
+    regressed = 0
+    for r in json.loads(head.read_text())["results"]:
+        if "error" in r or (b := base_results.get(key(r))) is None:
+            continue
+
+        ratio = r["per_op"] / b["per_op"]
+        flag = ""
+        if 1 + threshold < ratio:
+            flag = "  REGRESSED"
+            regressed += 1
+
+        print(f"{r['name']:<32} {r['size']:>7}  {ratio:>6.2f}x{flag}")
+
+    return 1 if regressed else 0
+
+
+def _import_time(module: str):
+    """(cumulative us of `module`, {name: self us} of all imports, heavy modules imported)"""
+    check = f"import sys, {module}; print(*[m for m in {HEAVY_MODULES!r} if m in sys.modules])"
+    proc = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", check],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+
+    total = 0
+    selfs: dict[str, int] = {}
+    for line in proc.stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        if not self_us.strip().isdigit():
+            # the header
+            continue
+
+        selfs[name.strip()] = int(self_us)
+        if name.strip() == module and not name.startswith("  "):
+            total = int(cumulative_us)
+
+    return total, selfs, proc.stdout.split()
+
+
+def startup(budget: float, runs: int):
+    """import time of the api (best of runs), fails over the budget (ms) or on heavy imports"""
+    results = [_import_time(STARTUP_MODULE) for _ in range(runs)]
+    total, selfs, heavy = min(results, key=lambda r: r[0])
+
+    print(f"import {STARTUP_MODULE}: {total / 1e3:.1f} ms (budget {budget:.0f} ms)")
+    for name, self_us in sorted(selfs.items(), key=lambda i: -i[1])[:10]:
+        print(f"  {self_us / 1e3:>8.1f} ms  {name}")
+
+    failed = 0
+    if budget < total / 1e3:
+        print("over budget")
+        failed = 1
+
+    if heavy:
+        print(f"imported eagerly: {', '.join(heavy)}")
+        failed = 1
+
+    return failed
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="benchmarks")
+    cmds = parser.add_subparsers(dest="cmd")
+
+    run_cmd = cmds.add_parser("run", help="time the hot paths on synthetic stores")
+    run_cmd.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    run_cmd.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    run_cmd.add_argument("--runs", type=int, default=10)
+    run_cmd.add_argument(
+        "--store-dir", type=Path, default=DEFAULT_STORE_DIR, help="kept, to be reused by later runs"
+    )
+    run_cmd.add_argument("--out", type=Path, help="json results (default: stdout)")
+
+    compare_cmd = cmds.add_parser("compare", help="compare two json results")
+    compare_cmd.add_argument("base", type=Path)
+    compare_cmd.add_argument("head", type=Path)
+    compare_cmd.add_argument("--threshold", type=float, default=0.2, help="(default: 0.2)")
+
+    startup_cmd = cmds.add_parser("startup", help="check the import time with -X importtime")
+    startup_cmd.add_argument("--budget-ms", type=float, default=100, help="(default: 100)")
+    startup_cmd.add_argument("--runs", type=int, default=5)
+
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    args = parse_args()
+
+    if args.cmd == "compare":
+        raise SystemExit(compare(args.base, args.head, args.threshold))
+
+    if args.cmd == "startup":
+        raise SystemExit(startup(args.budget_ms, args.runs))
+
+    if args.cmd == "run":
+        raise SystemExit(run(args.sizes, args.cases, args.runs, args.store_dir, args.out))
+
+    raise SystemExit("usage: python -m benchmarks {run,compare,startup} ...")
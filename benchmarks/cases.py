@@ -0,0 +1,186 @@
+import io
+import statistics
+import time
+from dataclasses import asdict, dataclass
+from types import SimpleNamespace
+from typing import Callable
+
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from mu_pki.cert import CertWrapper, builder, key_cache, load_or_init_root_ca, safe_storage
+from mu_pki.cert.meta import CertInfo, Meta
+from mu_pki.globals import G
+from mu_pki.menu.item import Item
+from mu_pki.menu.item_grid import ItemGrid
+from mu_pki.menu.item_provider import ItemProvider
+
+from .store import CA_NAME, EKUS, SIGN_CA_NAME
+
+# terminal size assumed by plan_col
+SCREEN_W = 240
+SCREEN_H = 60
+
+
+@dataclass
+class Result:
+    name: str
+    size: int
+    # operations per run
+    ops: int
+    runs: int
+    min: float
+    median: float
+    mean: float
+
+    @property
+    def per_op(self):
+        # the least noisy estimate on a busy machine
+        return self.min / self.ops
+
+    def to_raw(self):
+        return asdict(self) | {"per_op": self.per_op}
+
+
+def measure(
+    name: str,
+    size: int,
+    fn: Callable[[], object],
+    runs: int,
+    ops: int = 1,
+    setup: Callable[[], object] | None = None,
+):
+    """time `runs` calls of `fn`, each after an untimed `setup`"""
+    times: list[float] = []
+    for _ in range(runs):
+        if setup:
+            setup()
+
+        t = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - t)
+
+    return Result(
+        name, size, ops, runs, min(times), statistics.median(times), statistics.mean(times)
+    )
+
+
+def _ca(root: CertWrapper, name: str):
+    cp = root.get_child(name)
+    cp.load()
+    return cp
+
+
+def load_root(size: int, runs: int):
+    return measure("load_or_init_root_ca", size, load_or_init_root_ca, runs)
+
+
+def meta_update(size: int, runs: int):
+    ca = _ca(load_or_init_root_ca(), CA_NAME)
+    ca.meta.update()
+
+    def cold():
+        ca.meta.cache_path.unlink(missing_ok=True)
+        ca.meta = Meta.init_from(ca)
+
+    def warm():
+        ca.meta = Meta.init_from(ca)
+
+    return [
+        measure(
+            "Meta.update (cold)", size, lambda: ca.meta.update(), max(1, runs // 4), setup=cold
+        ),
+        measure("Meta.update (warm)", size, lambda: ca.meta.update(), runs, setup=warm),
+        measure("Meta.init_from", size, lambda: Meta.init_from(ca), runs),
+    ]
+
+
+def meta_save(size: int, runs: int):
+    ca = _ca(load_or_init_root_ca(), CA_NAME)
+    name = next(iter(ca.meta.certs))
+
+    def touch():
+        info = ca.meta.certs[name]
+        ca.meta.set_cert(name, CertInfo(info.id, info.exp))
+
+    def first():
+        ca.meta = Meta.init_from(ca)
+        touch()
+
+    return [
+        # includes the deferred tomlkit parse
+        measure("Meta.save (first)", size, lambda: ca.meta.save(), max(1, runs // 4), setup=first),
+        measure("Meta.save", size, lambda: ca.meta.save(), runs, setup=touch),
+    ]
+
+
+def sign_csr(size: int, runs: int, ops: int = 50):
+    ca = _ca(load_or_init_root_ca(), SIGN_CA_NAME)
+    pub = ec.generate_private_key(G.EC_CURVE).public_key()
+    leaf = ca.get_child("leaf")
+    csr = leaf.build_csr(False, builder.subject(leaf.name), EKUS, pub)
+
+    def one_by_one():
+        for _ in range(ops):
+            ca.sign_csr(leaf.path, csr)
+
+    def batched():
+        with ca.meta.batch():
+            one_by_one()
+
+    def cold_key():
+        key_cache.lock_all()
+        ca.key.load()
+
+    return [
+        measure("CertWrapper.sign_csr", size, one_by_one, runs, ops),
+        measure("CertWrapper.sign_csr (batched)", size, batched, runs, ops),
+        measure("KeyWrapper.load (cold)", size, cold_key, runs),
+    ]
+
+
+def key_storage(size: int, runs: int, ops: int = 200):
+    key = ec.generate_private_key(G.EC_CURVE)
+    aad = b"bench"
+    fp = io.BytesIO()
+    safe_storage.write_key(fp, key, aad)
+    raw = fp.getvalue()
+
+    def write():
+        for _ in range(ops):
+            safe_storage.write_key(io.BytesIO(), key, aad)
+
+    def read():
+        for _ in range(ops):
+            safe_storage.read_key(io.BytesIO(raw), aad)
+
+    return [
+        measure("safe_storage.write_key", size, write, runs, ops),
+        measure("safe_storage.read_key", size, read, runs, ops),
+    ]
+
+
+def plan_col(size: int, runs: int):
+    ca = _ca(load_or_init_root_ca(), CA_NAME)
+    itp = ItemProvider(Item(name) for name in ca.meta.certs)
+
+    dp = SimpleNamespace(max_w=SCREEN_W, max_h=SCREEN_H)
+    grid = ItemGrid(dp, True, itp)  # type: ignore
+
+    def cold():
+        itp.changed()
+
+    return [
+        measure("ItemGrid.plan_col (cold)", size, grid.plan_col, runs, setup=cold),
+        # a redraw, with the layout cached in the provider
+        measure("ItemGrid.plan_col", size, grid.plan_col, runs),
+    ]
+
+
+CASES = {
+    "load": load_root,
+    "update": meta_update,
+    "save": meta_save,
+    "sign": sign_csr,
+    "key": key_storage,
+    "plan_col": plan_col,
+}
@@ -0,0 +1,64 @@
+import base64
+import os
+from pathlib import Path
+
+from cryptography.hazmat.primitives.asymmetric import ec
+from cryptography.x509.oid import ExtendedKeyUsageOID
+
+from mu_pki.cert import CertWrapper, builder, load_or_init_root_ca
+from mu_pki.cert.meta import CertInfo, Meta
+from mu_pki.globals import G
+
+KEY_NAME = ".bench-enc-key"
+CA_NAME = "bench"
+# small ca, for signing without growing the measured one
+SIGN_CA_NAME = "sign"
+EKUS = [ExtendedKeyUsageOID.SERVER_AUTH]
+
+
+def use(store_dir: Path):
+    """point `G` at a synthetic store, each store has its own (random) encryption key"""
+    store_dir.mkdir(parents=True, exist_ok=True)
+    key_path = store_dir / KEY_NAME
+    if not key_path.is_file():
+        key_path.write_bytes(base64.b64encode(os.urandom(16)))
+
+    G.ROOT_DIR = store_dir
+    G.ENC_KEY = base64.b64decode(key_path.read_bytes())
+
+
+def sub_ca(root: CertWrapper, name: str):
+    cp = root.get_child(name)
+    if cp.exists():
+        cp.load()
+        return cp
+
+    cp.key.generate()
+    csr = cp.build_csr(True, builder.subject(builder.default_cn(name, True)), [])
+    cp.cert = root.sign_csr(cp.path, csr)
+    cp.dump()
+    cp.meta = Meta.init_from(cp)
+
+    return cp
+
+
+def build(store_dir: Path, size: int):
+    """store with `size` leaves under a single ca, grown as needed, so it could be reused"""
+    use(store_dir)
+    root = load_or_init_root_ca()
+    ca = sub_ca(root, CA_NAME)
+    sub_ca(root, SIGN_CA_NAME)
+
+    if len(ca.meta.certs) < size:
+        # leaf keys are never read by the measured paths, so they all share one
+        pub = ec.generate_private_key(G.EC_CURVE).public_key()
+        with ca.meta.batch():
+            for i in range(len(ca.meta.certs), size):
+                cp = ca.get_child(f"leaf{i:06d}")
+                cp.cert = ca.sign(cp.build_csr(False, builder.subject(cp.name), EKUS, pub))
+                cp.dump()
+                ca.meta.set_cert(
+                    cp.name, CertInfo(cp.cert.serial_number, cp.cert.not_valid_after_utc)
+                )
+
+    return root
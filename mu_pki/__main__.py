@@ -1,116 +1,294 @@
-import curses
-from functools import cached_property
+import argparse
+import datetime as dt
 from pathlib import Path
 
-from mu_pki.cert import CertWrapper, load_or_init_root_ca
+from mu_pki import api
 from mu_pki.globals import G
-from mu_pki.menu import sel_menu, show_cert
-from mu_pki.menu.display import dp
-from mu_pki.menu.item import Item
-from mu_pki.menu.item_provider import ItemProvider
-from mu_pki.menu.select import sel_sl
 
-_CERT_OPT = {"x"}
-_CA_OPT = {"d", "n"}
+# engines and the menu are only imported by the commands using them, for a fast startup
 
 
-class FilenameItem(Item):
-    DIR_NOTE = "@"
-    MISS_NOTE = "# "
+def main(root_dir: Path):
+    from mu_pki import tui
 
-    def __init__(self, text: str, is_dir: bool, is_miss) -> None:
-        self.name = text
-        self.is_dir = is_dir
-        self.is_miss = is_miss
+    tui.main(root_dir)
 
-    @cached_property
-    def _text(self):
-        filename = f"{self.DIR_NOTE if self.is_dir else ''}{self.name}"
-        return f"{self.MISS_NOTE if self.is_miss else ''}{filename}"
 
+def issue(root_dir: Path, manifest: Path, workers: int | None):
+    results = api.issue(api.open_store(root_dir), manifest, workers)
 
-def access_cert(cp: CertWrapper):
-    while True:
-        opt = set(_CERT_OPT)
-        opt_itp = ItemProvider()
-        opt_itp.append(Item("x - return"))
-        if cp.isCA:
-            opt |= _CA_OPT
-            opt_itp.append(Item("d - new directory"))
-            opt_itp.append(Item("n - new item"))
+    failed = [r for r in results if r.err]
+    for result in failed:
+        print(f"{result.entry.path}: {result.err}")
 
-        if cp.key:
-            opt.add("p")
-            opt_itp.append(Item("p - print key"))
+    print(f"issued {len(results) - len(failed)}, failed {len(failed)}")
+    return 1 if failed else 0
 
-        else:
-            opt.add("v")
-            opt_itp.append(Item("v - verify key"))
 
-        child_itp = None
-        if cp.isCA:
-            cp.meta.update()
-            child_itp = ItemProvider()
-            for name, info in cp.meta.certs.items():
-                child_itp.append(FilenameItem(name, info.id in cp.meta.ca, info.id in cp.meta.miss))
+def query_index(root_dir: Path, rebuild: bool, serial: str | None, expiring: str | None):
+    from mu_pki.cert import index
+
+    G.INDEX = True
+    root = api.open_store(root_dir)
+    if rebuild:
+        index.rebuild(root)
+
+    rows = []
+    if serial:
+        rows += filter(None, [index.find_serial(int(serial, 16))])
+
+    if expiring:
+        rows += index.expiring_before(dt.datetime.fromisoformat(expiring))
+
+    for row in rows:
+        flag = " (revoked)" if row["revoked"] else ""
+        print(f"{row['serial']}  {row['exp']}  {row['path']}{flag}")
+
+
+def revoke(root_dir: Path, path: Path):
+    api.revoke(api.open_store(root_dir), path)
+
+
+def build_crl(root_dir: Path, path: Path | None, force: bool):
+    for cp in api.build_crl(api.open_store(root_dir), path, force):
+        print(f"{cp.path}: crl no. {cp.meta.crl_state.no} ({len(cp.meta.crl)} revoked)")
+
+
+def pack_certs(root_dir: Path, path: Path, undo: bool):
+    count = api.pack(api.open_store(root_dir), path, undo)
+    if undo:
+        print(f"{path}: {count} certs exported to pem files")
+    else:
+        print(f"{path}: {count} certs packed")
+
+
+def serve_ocsp(root_dir: Path, listen: str):
+    import asyncio
+
+    from mu_pki.cert.responder import Responder
 
-        show_cert(cp, opt_itp, child_itp)
-        sel = sel_menu(opt, child_itp)
+    host, _, port = listen.rpartition(":")
+    responder = Responder(api.open_store(root_dir))
+    asyncio.run(responder.serve(host or "127.0.0.1", int(port)))
 
-        if sel == "x":
-            return
 
-        if sel == "v":
-            cp.key.load()
-            continue
+def serve(root_dir: Path, socket_path: Path | None):
+    import asyncio
 
-        if sel == "p":
-            dp.show_notif(cp.key.pem.decode())
-            continue
+    from mu_pki.cert.signer import SOCKET_NAME, Signer
 
-        if isinstance(sel, int) and child_itp:
-            name = child_itp[sel].name  # type: ignore
-            if cp.meta.certs[name].id in cp.meta.miss:
-                dp.show_notif(f"File for cert '{name}' is missing.")
-                continue
+    signer = Signer(api.open_store(root_dir))
+    asyncio.run(signer.serve(socket_path or G.ROOT_DIR / SOCKET_NAME))
 
-            next_cp = cp.get_child(name)
-            next_cp.load()
 
+def renew(root_dir: Path, within: int, dry_run: bool, workers: int | None):
+    dues = api.renew(api.open_store(root_dir), dt.timedelta(days=within), dry_run, workers)
+    for due in dues:
+        if due.err:
+            state = f"failed: {due.err}"
+        elif due.info:
+            state = f"renewed until {due.info.exp:%Y-%m-%d}"
         else:
-            if sel == "n":
-                is_directory = False
-                name = sel_sl("cert name")
+            state = f"would be renewed until {due.new_exp:%Y-%m-%d}"
 
-            elif sel == "d":
-                is_directory = True
-                name = sel_sl("dir name")
+        print(f"{due.exp:%Y-%m-%d}  {due.path}  {state}")
 
-            else:
-                raise Exception()
+    return 1 if any(due.err for due in dues) else 0
 
-            if name in cp.meta.certs:
-                dp.show_notif(f"Cert with '{name}' already exist.")
-                continue
 
-            next_cp = cp.get_child(name)
-            next_cp.create(is_directory)
+def verify(root_dir: Path, out: Path | None, workers: int | None):
+    import json
+    import sys
 
-        access_cert(next_cp)
+    report = api.verify(api.open_store(root_dir), workers)
+    raw = json.dumps(report.to_raw(), indent=2)
+    if out:
+        out.write_text(raw)
+    else:
+        print(raw)
 
+    print(
+        f"{report.certs} certs under {report.cas} cas, {len(report.issues)} issues",
+        file=sys.stderr,
+    )
+    return 1 if report.issues else 0
 
-def main(root_dir: Path):
+
+def fill_key_pool(root_dir: Path, size: int | None):
+    api.open_store(root_dir)
+    print(f"{api.fill_key_pool(size)} keys generated")
+
+
+def publish(root_dir: Path, out_dir: Path, manifest: Path | None):
+    result = api.publish(api.open_store(root_dir), out_dir, manifest)
+    for rel in result.written:
+        print(f"written {rel}")
+
+    for rel in result.removed:
+        print(f"removed {rel}")
+
+    print(
+        f"{len(result.written)} written, {result.unchanged} unchanged, {len(result.removed)} removed"
+    )
+
+
+def _p12_password(password_file: Path | None):
+    import getpass
+
+    if password_file:
+        password = password_file.read_text().rstrip("\n")
+    else:
+        password = getpass.getpass("p12 password: ")
+        if password != getpass.getpass("again: "):
+            raise SystemExit("passwords differ")
+
+    if not password:
+        raise SystemExit("p12 holds the private key, a password is required")
+
+    return password.encode()
+
+
+def export(
+    root_dir: Path, path: Path, fmt: str, tree: bool, out: Path | None, password_file: Path | None
+):
+    import os
+    import sys
+
+    password = _p12_password(password_file) if fmt == "p12" else None
+    root = api.open_store(root_dir)
+
+    # never overwritten, and only readable by the owner, as it may hold keys
+    fp = os.fdopen(os.open(out, os.O_WRONLY | os.O_CREAT | os.O_EXCL, 0o600), "wb") if out else None
     try:
-        G.ROOT_DIR = root_dir
+        if tree:
+            count = api.export_tree(root, path, fp or sys.stdout.buffer, fmt, password)  # type: ignore
+            print(f"{path}: {count} certs exported", file=sys.stderr)
+        else:
+            (fp or sys.stdout.buffer).write(api.export(root, path, fmt, password))  # type: ignore
 
-        G.ROOT_DIR.mkdir(mode=750, parents=True, exist_ok=True)
-        root = load_or_init_root_ca()
+    except BaseException:
+        if out:
+            out.unlink(missing_ok=True)
 
-        access_cert(root)
+        raise
 
     finally:
-        curses.endwin()
+        if fp:
+            fp.close()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(prog="mu_pki")
+    parser.add_argument("--root", type=Path, default=Path(__file__).parents[1] / "store")
+    cmds = parser.add_subparsers(dest="cmd")
+
+    issue_cmd = cmds.add_parser("issue", help="issue certs listed in a manifest, without prompts")
+    issue_cmd.add_argument("--manifest", type=Path, required=True)
+    issue_cmd.add_argument("--workers", type=int, default=None)
+
+    index_cmd = cmds.add_parser("index", help="query the sqlite index of issued certs")
+    index_cmd.add_argument("--rebuild", action="store_true", help="re-index the whole tree")
+    index_cmd.add_argument("--serial", help="find the cert with this (hex) serial")
+    index_cmd.add_argument("--expiring-before", dest="expiring", help="iso date")
+
+    revoke_cmd = cmds.add_parser("revoke", help="revoke a cert, and update the crl of its ca")
+    revoke_cmd.add_argument("path", type=Path)
+
+    crl_cmd = cmds.add_parser("crl", help="sign the crls that changed or are about to expire")
+    crl_cmd.add_argument("--path", type=Path, help="only this ca, instead of the whole tree")
+    crl_cmd.add_argument("--force", action="store_true", help="sign new base crls regardless")
+
+    pack_cmd = cmds.add_parser(
+        "pack", help="move the certs issued by a ca into a single file, or compact it"
+    )
+    pack_cmd.add_argument("path", type=Path)
+    pack_cmd.add_argument("--undo", action="store_true", help="export back to pem files")
+
+    ocsp_cmd = cmds.add_parser("ocsp", help="answer ocsp requests for all cas of the tree")
+    ocsp_cmd.add_argument("--listen", default="127.0.0.1:8080", help="[host:]port")
+
+    serve_cmd = cmds.add_parser("serve", help="sign csrs sent over a unix socket")
+    serve_cmd.add_argument("--socket", type=Path, help="(default: <root>/sign.sock)")
+
+    renew_cmd = cmds.add_parser("renew", help="renew all certs of the tree expiring soon")
+    renew_cmd.add_argument("--within", type=int, default=90, help="days (default: 90)")
+    renew_cmd.add_argument("--dry-run", action="store_true", help="only report what is due")
+    renew_cmd.add_argument("--workers", type=int, default=None)
+
+    verify_cmd = cmds.add_parser(
+        "verify", help="check the signatures, keys, validity and metas of the whole tree"
+    )
+    verify_cmd.add_argument("--out", type=Path, help="json report (default: stdout)")
+    verify_cmd.add_argument("--workers", type=int, default=None)
+
+    pool_cmd = cmds.add_parser("pool", help="pre-generate keys for new certs")
+    pool_cmd.add_argument("--size", type=int, help="keys to keep (default: KEY_POOL)")
+
+    publish_cmd = cmds.add_parser(
+        "publish", help="write the issuer certs and crls, laid out as their urls"
+    )
+    publish_cmd.add_argument("--out", type=Path, required=True, help="served as .../pki/")
+    publish_cmd.add_argument(
+        "--manifest",
+        type=Path,
+        help="hashes of the last run, outside of --out (default: in the store)",
+    )
+
+    export_cmd = cmds.add_parser("export", help="export a cert, or all the leaves under a ca")
+    export_cmd.add_argument("path", type=Path)
+    export_cmd.add_argument(
+        "--format",
+        dest="fmt",
+        choices=["pem", "fullchain", "der", "p12"],
+        help="(default: pem, fullchain with --tree)",
+    )
+    export_cmd.add_argument("--tree", action="store_true", help="as a .tar.gz of the subtree")
+    export_cmd.add_argument("--out", type=Path, help="created, mode 0600 (default: stdout)")
+    export_cmd.add_argument(
+        "--password-file", type=Path, help="p12 password (default: prompted for)"
+    )
+
+    return parser.parse_args()
 
 
 if __name__ == "__main__":
-    main(Path(__file__).parents[1] / "store")
+    args = parse_args()
+
+    if args.cmd == "issue":
+        raise SystemExit(issue(args.root, args.manifest, args.workers))
+
+    if args.cmd == "index":
+        raise SystemExit(query_index(args.root, args.rebuild, args.serial, args.expiring))
+
+    if args.cmd == "revoke":
+        raise SystemExit(revoke(args.root, args.path))
+
+    if args.cmd == "crl":
+        raise SystemExit(build_crl(args.root, args.path, args.force))
+
+    if args.cmd == "pack":
+        raise SystemExit(pack_certs(args.root, args.path, args.undo))
+
+    if args.cmd == "renew":
+        raise SystemExit(renew(args.root, args.within, args.dry_run, args.workers))
+
+    if args.cmd == "ocsp":
+        raise SystemExit(serve_ocsp(args.root, args.listen))
+
+    if args.cmd == "verify":
+        raise SystemExit(verify(args.root, args.out, args.workers))
+
+    if args.cmd == "pool":
+        raise SystemExit(fill_key_pool(args.root, args.size))
+
+    if args.cmd == "publish":
+        raise SystemExit(publish(args.root, args.out, args.manifest))
+
+    if args.cmd == "export":
+        fmt = args.fmt or ("fullchain" if args.tree else "pem")
+        raise SystemExit(export(args.root, args.path, fmt, args.tree, args.out, args.password_file))
+
+    if args.cmd == "serve":
+        raise SystemExit(serve(args.root, args.socket))
+
+    main(args.root)
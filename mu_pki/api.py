@@ -0,0 +1,145 @@
+# the pki without the menu, for scripts and services
+# cheap to import, the engines (and cryptography, pydantic, ...) are only imported once used
+
+import datetime as dt
+from pathlib import Path
+from typing import TYPE_CHECKING, BinaryIO
+
+from mu_pki.globals import G
+
+if TYPE_CHECKING:
+    from mu_pki.cert import CertWrapper
+    from mu_pki.cert.batch import Entry
+    from mu_pki.cert.export import Format
+
+FOLDER_MODE = 0o750
+
+
+def open_store(root_dir: Path):
+    """point `G` at the store, and load its root ca (generated if missing)"""
+    from mu_pki.cert import load_or_init_root_ca
+
+    G.ROOT_DIR = root_dir
+    G.ROOT_DIR.mkdir(mode=FOLDER_MODE, parents=True, exist_ok=True)
+    return load_or_init_root_ca()
+
+
+def find(root: "CertWrapper", path: Path):
+    """load the cert at `path` (e.g. `k1/sub/leaf`), and all of its parents"""
+    from mu_pki.cert import root_ca
+
+    return root_ca.find(root, path)
+
+
+def find_ca(root: "CertWrapper", path: Path):
+    cp = find(root, path)
+    if not cp.isCA:
+        raise ValueError("cert '{}' is not a ca".format(path))
+
+    return cp
+
+
+def issue(root: "CertWrapper", entries: "list[Entry] | Path", workers: int | None = None):
+    """issue the certs of a manifest (or its parsed entries), one result per entry"""
+    from mu_pki.cert import batch
+
+    if isinstance(entries, Path):
+        entries = batch.load_manifest(entries)
+
+    return batch.issue(root, entries, workers)
+
+
+def renew(
+    root: "CertWrapper",
+    within: dt.timedelta,
+    dry_run: bool = False,
+    workers: int | None = None,
+):
+    """certs of the tree expiring within, renewed unless a dry run"""
+    from mu_pki.cert import renewal
+
+    dues, issuers = renewal.collect(root, within)
+    if not dry_run:
+        dues = renewal.renew(issuers, dues, workers)
+
+    return dues
+
+
+def revoke(root: "CertWrapper", path: Path):
+    """revoke a cert, and update the crl of its ca"""
+    from mu_pki.cert import crl
+
+    cp = find(root, path)
+    if cp == cp.parent:
+        raise ValueError("the root ca could not be revoked")
+
+    cp.parent.meta.revoke(cp.name)
+    crl.build(cp.parent)
+    return cp
+
+
+def build_crl(root: "CertWrapper", path: Path | None = None, force: bool = False):
+    """cas (of the tree, or only the one at `path`) whose crl got signed"""
+    from mu_pki.cert import crl
+
+    if path:
+        cp = find_ca(root, path)
+        return [cp] if crl.build(cp, force) else []
+
+    return crl.build_all(root, force)
+
+
+def pack(root: "CertWrapper", path: Path, undo: bool = False):
+    """number of certs of the ca moved into (or, if undone, out of) its pack"""
+    from mu_pki.cert import pack
+
+    cp = find_ca(root, path)
+    return pack.unpack_certs(cp) if undo else pack.pack_certs(cp)
+
+
+def verify(root: "CertWrapper", workers: int | None = None):
+    """check signatures, key ids, validity, keys and metas of the whole tree, across processes"""
+    from mu_pki.cert import verify
+
+    return verify.verify(root, workers)
+
+
+def fill_key_pool(size: int | None = None):
+    """pre-generate keys up to `size` (default: `KEY_POOL`) for the store opened, returns how many"""
+    from mu_pki.cert import key_pool
+
+    return key_pool.fill(size)
+
+
+def publish(root: "CertWrapper", out_dir: Path, manifest: Path | None = None):
+    """write the issuer certs and crls into `out_dir` as served at the aia and cdp urls
+
+    incremental, only the files whose content changed since the last run (as recorded in
+    `manifest`, by default under the store) are rewritten
+    """
+    from mu_pki.cert import publish
+
+    return publish.publish(root, out_dir, manifest)
+
+
+def export(root: "CertWrapper", path: Path, fmt: "Format" = "pem", password: bytes | None = None):
+    """the cert at `path` as pem, fullchain pem, der, or pkcs#12
+
+    pkcs#12 includes the key if there is one, which requires a `password` to encrypt it with
+    """
+    from mu_pki.cert import export
+
+    return export.encode(find(root, path), fmt, password)
+
+
+def export_tree(
+    root: "CertWrapper",
+    path: Path,
+    out: BinaryIO,
+    fmt: "Format" = "fullchain",
+    password: bytes | None = None,
+):
+    """stream all the leaves under the ca at `path` into a gzipped tarball, returns how many"""
+    from mu_pki.cert import export
+
+    return export.write_tar(find_ca(root, path), out, fmt, password)
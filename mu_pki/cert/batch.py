@@ -0,0 +1,175 @@
+import math
+import os
+import tomllib
+from collections import defaultdict
+from concurrent.futures import as_completed
+from dataclasses import dataclass
+from pathlib import Path
+
+from cryptography import x509
+from cryptography.x509.oid import ObjectIdentifier
+
+from mu_pki.globals import G
+
+from . import builder, index, worker
+from .cert_wrapper import CertWrapper
+from .meta import CertInfo
+
+CHUNK_SIZE = 64
+
+
+@dataclass
+class Entry:
+    path: Path
+    cn: str | None = None
+    ekus: list[str] | None = None
+    ca: bool = False
+
+
+@dataclass
+class Result:
+    entry: Entry
+    info: CertInfo | None = None
+    err: str | None = None
+
+
+def load_manifest(file_path: Path):
+    with file_path.open("rb") as fp:
+        manifest = tomllib.load(fp)
+
+    entries: list[Entry] = []
+    for raw in manifest.get("cert", []):
+        path = Path(raw["path"])
+        if len(path.parts) < 2 or path.parts[0] != G.ROOT_NAME:
+            raise ValueError("cert path '{}' is not under '{}'".format(path, G.ROOT_NAME))
+
+        # hidden from listings, as are the temp and cache files of the store
+        if any(part.startswith(".") for part in path.parts):
+            raise ValueError("cert path '{}' has a name starting with '.'".format(path))
+
+        entries.append(Entry(path, raw.get("cn"), raw.get("ekus"), raw.get("ca", False)))
+
+    return entries
+
+
+# --- worker side ---
+def _issue_chunk(issuer_path: Path, entries: list[Entry]):
+    issuer = worker.issuer(issuer_path)
+
+    results: list[Result] = []
+    certs: list[tuple[Path, x509.Certificate]] = []
+    for entry in entries:
+        cp = issuer.get_child(entry.path.name)
+        key_created = False
+        try:
+            cp.key.generate()
+            key_created = True
+
+            sub = builder.subject(entry.cn or builder.default_cn(cp.name, entry.ca))
+            ekus = [ObjectIdentifier(eku) for eku in entry.ekus or []]
+            cp.cert = issuer.sign(cp.build_csr(entry.ca, sub, ekus))
+            cp.dump()
+
+            info = CertInfo(cp.cert.serial_number, cp.cert.not_valid_after_utc)
+            results.append(Result(entry, info))
+            certs.append((cp.path, cp.cert))
+
+        except Exception as e:
+            # an orphaned key would fail every retry of the entry with "exists"
+            if key_created:
+                cp.key.file_path.unlink(missing_ok=True)
+
+            results.append(Result(entry, err=str(e)))
+
+    index.record(certs)
+
+    return results
+
+
+# --- main side ---
+def _resolve(root: CertWrapper, issuers: dict[Path, CertWrapper], path: Path):
+    if path in issuers:
+        return issuers[path]
+
+    if len(path.parts) == 1:
+        cp = root
+    else:
+        cp = _resolve(root, issuers, path.parent).get_child(path.name)
+        cp.load()
+
+    if not cp.isCA:
+        raise ValueError("cert '{}' is not a ca".format(path))
+
+    issuers[path] = cp
+    return cp
+
+
+def issue(root: CertWrapper, entries: list[Entry], workers: int | None = None):
+    workers = workers or os.cpu_count() or 1
+    issuers: dict[Path, CertWrapper] = {}
+    queued: set[Path] = set()
+    issued: dict[Path, list[Result]] = defaultdict(list)
+    results: list[Result] = []
+
+    # parents must exist before their children get signed, so go one level at a time
+    levels: dict[int, list[Entry]] = defaultdict(list)
+    for entry in entries:
+        levels[len(entry.path.parts)].append(entry)
+
+    with worker.pool(workers) as pool:
+        for level in sorted(levels):
+            groups: dict[Path, list[Entry]] = defaultdict(list)
+            for entry in levels[level]:
+                try:
+                    issuer = _resolve(root, issuers, entry.path.parent)
+                except (FileNotFoundError, ValueError) as e:
+                    results.append(Result(entry, err=str(e)))
+                    continue
+
+                cp = issuer.get_child(entry.path.name)
+                if entry.path in queued or entry.path.name in issuer.meta.certs or cp.exists():
+                    results.append(Result(entry, err="Cert '{}' exists.".format(entry.path)))
+                    continue
+
+                queued.add(entry.path)
+
+                if entry.ekus is None and not entry.ca:
+                    entry.ekus = issuer.meta.ekus
+
+                groups[issuer.path].append(entry)
+
+            futures = []
+            for issuer_path, group in groups.items():
+                size = min(CHUNK_SIZE, math.ceil(len(group) / workers))
+                for i in range(0, len(group), size):
+                    futures.append(pool.submit(_issue_chunk, issuer_path, group[i : i + size]))
+
+            for future in as_completed(futures):
+                for result in future.result():
+                    results.append(result)
+                    if result.info:
+                        issued[result.entry.path.parent].append(result)
+
+    # the ekus of the last leaf issued under each ca (in manifest order) become its default,
+    # as in the menu
+    succeeded = {r.entry.path for group in issued.values() for r in group}
+    last_ekus: dict[Path, list[str]] = {}
+    for entry in entries:
+        if entry.path in succeeded and not entry.ca and entry.ekus:
+            last_ekus[entry.path.parent] = entry.ekus
+
+    # one meta update per ca
+    for issuer_path, group in issued.items():
+        meta = issuers[issuer_path].meta
+        for result in group:
+            assert result.info
+            meta.set_cert(result.entry.path.name, result.info)
+            if result.entry.ca:
+                meta.add("ca", result.info.id)
+
+        if (ekus := last_ekus.get(issuer_path)) and ekus != meta.ekus:
+            meta.ekus = list(ekus)
+
+        meta.save()
+
+    return results
@@ -5,11 +5,13 @@ from typing import Self
 from cryptography import x509
 from cryptography.hazmat.primitives import hashes
 from cryptography.hazmat.primitives import serialization as ser
+from cryptography.hazmat.primitives.asymmetric.types import CertificatePublicKeyTypes
 from cryptography.x509.extensions import ExtensionNotFound, ExtensionTypeVar
 
 from mu_pki.globals import G
+from mu_pki.trace import span
 
-from . import builder
+from . import builder, index, pack
 from .key_wrapper import KeyWrapper
 from .meta import CRT_EXT, CertInfo, Meta
 
@@ -36,6 +38,8 @@ class CertWrapper:
 
         self.key = KeyWrapper(self.path)
         self.cert: x509.Certificate = None  # type: ignore
+        # whether the cert is in the pack of the parent, instead of a loose file
+        self.packed = False
         self.meta: Meta
 
     @cached_property
@@ -46,6 +50,20 @@ class CertWrapper:
     def file_path(self):
         return G.ROOT_DIR / f"{self.path}.{CRT_EXT}"
 
+    @cached_property
+    def pack(self):
+        """pack of the certs issued by this ca, if it uses one"""
+        return pack.find(self.sub_dir)
+
+    @property
+    def parent_pack(self):
+        return self.parent.pack if self.parent is not self else None
+
+    def refresh_pack(self):
+        """look the pack up again, other processes may have created or dropped it since"""
+        self.__dict__.pop("pack", None)
+        return self.pack
+
     @cached_property
     def sha256(self):
         return self.cert.fingerprint(hashes.SHA256())
@@ -91,72 +109,139 @@ class CertWrapper:
         elif self.sub_dir.is_dir():
             self.sub_dir.rmdir()
 
-        self.file_path.chmod(FILE_MODE)
+        if not self.packed:
+            self.file_path.chmod(FILE_MODE)
 
-    def load(self):
-        if self.cert:
-            return
+    def packed_der(self):
+        """der of the cert in the pack of the parent, which is looked up again on a miss"""
+        for retry in (False, True):
+            if retry:
+                if self.parent is self:
+                    break
 
-        if not self.file_path.is_file():
-            raise FileNotFoundError("Missing cert file '{}'.".format(self.path))
+                self.parent.refresh_pack()
+
+            try:
+                if (pk := self.parent_pack) and (der := pk.get(self.name)):
+                    return der
 
-        with self.file_path.open("rb") as fp:
-            self.cert = x509.load_pem_x509_certificate(fp.read())
+            except FileNotFoundError:
+                # unpacked by another process
+                pass
+
+        return None
+
+    def exists(self):
+        return self.file_path.is_file() or self.packed_der() is not None
+
+    def read(self):
+        # a loose file wins over the pack, it could only have been written since
+        if self.file_path.is_file():
+            with self.file_path.open("rb") as fp:
+                self.cert = x509.load_pem_x509_certificate(fp.read())
+
+            self.packed = False
+
+        elif der := self.packed_der():
+            self.cert = x509.load_der_x509_certificate(der)
+            self.packed = True
+
+        else:
+            raise FileNotFoundError("Missing cert file '{}'.".format(self.path))
 
         self.key.skid = self.skid
 
+    @span("CertWrapper.load")
+    def load(self):
+        if self.cert:
+            return
+
+        self.read()
         self.fix_fs()
         if self.isCA:
             self.meta = Meta.init_from(self)
 
     def dump(self):
-        with self.file_path.open("wb") as fp:
-            fp.write(self.cert.public_bytes(ser.Encoding.PEM))
+        # a pack created by another process since must not be shadowed by a loose file
+        if self.parent is not self:
+            self.parent.refresh_pack()
+
+        if pk := self.parent_pack:
+            pk.append(self.name, self.cert.public_bytes(ser.Encoding.DER))
+            self.file_path.unlink(missing_ok=True)
+            self.packed = True
+
+        else:
+            with self.file_path.open("wb") as fp:
+                fp.write(self.cert.public_bytes(ser.Encoding.PEM))
 
         self.fix_fs()
 
     def create(self, isCA: bool):
-        if self.file_path.is_file():
+        """prompts for the subject and the ekus in the menu"""
+        from mu_pki.menu import prompt
+
+        if self.exists():
             raise FileExistsError("Cert '{}' exists.".format(self.path))
 
         self.key.generate()
 
+        ekus = []
+        if not isCA and (ekus := prompt.eku(self.parent.meta.ekus)):
+            self.parent.meta.ekus = [eku.dotted_string for eku in ekus]
+
+        csr = self.build_csr(isCA, prompt.sub(self.name, isCA), ekus)
+        self.cert = self.parent.sign_csr(self.path, csr)
+        self.dump()
+        if isCA:
+            self.meta = Meta.init_from(self)
+
+    def build_csr(
+        self,
+        isCA: bool,
+        sub: x509.Name,
+        ekus: list[x509.ObjectIdentifier],
+        pub: CertificatePublicKeyTypes | None = None,
+    ):
+        """`pub` is for keys held elsewhere, defaults to the own key"""
         csr = (
             x509.CertificateBuilder()
-            .subject_name(builder.sub(self.name, isCA))
-            .public_key(self.key.pub)
+            .subject_name(sub)
+            .public_key(pub or self.key.pub)
             .not_valid_before(builder.T_LAST_GRID)
             .not_valid_after(builder.exp(isCA))
             .add_extension(x509.BasicConstraints(ca=isCA, path_length=None), critical=True)
             .add_extension(builder.ku(isCA), critical=True)
-            .add_extension(self.key.skid, critical=False)
+            .add_extension(
+                x509.SubjectKeyIdentifier.from_public_key(pub) if pub else self.key.skid,  # type: ignore
+                critical=False,
+            )
         )
-        if not isCA and (ekus := builder.eku(self.parent.meta.ekus)):
-            self.meta.ekus = [eku.dotted_string for eku in ekus]
-            self.meta.save()
+        if ekus:
             csr = csr.add_extension(x509.ExtendedKeyUsage(ekus), critical=False)
 
-        self.cert = self.parent.sign_csr(self.path, csr)
-        self.dump()
-        if isCA:
-            self.meta = Meta.init_from(self)
+        return csr
 
-    def renew(self):
+    def renewal_csr(self):
         csr = (
             x509.CertificateBuilder()
             .subject_name(self.cert.subject)
-            .public_key(self.key.pub)
+            .public_key(self.cert.public_key())  # type: ignore
             .not_valid_before(builder.T_LAST_GRID)
             .not_valid_after(builder.exp(self.isCA))
         )
 
         for ext in (ext for ext in self.cert.extensions if ext.oid not in SKIPED_OID):
-            csr.add_extension(ext.value, ext.critical)
+            csr = csr.add_extension(ext.value, ext.critical)
 
-        self.cert = self.parent.sign_csr(self.path, csr)
+        return csr
+
+    def renew(self):
+        self.cert = self.parent.sign_csr(self.path, self.renewal_csr())
+        self.__dict__.pop("sha256", None)
         self.dump()
 
-    def sign_csr(self, path: Path, csr: x509.CertificateBuilder):
+    def sign(self, csr: x509.CertificateBuilder):
         if not self.isCA:
             raise Exception("cert '{}' is not a ca".format(self.path))
 
@@ -171,11 +256,14 @@ class CertWrapper:
             .add_extension(builder.crl_dp(self.path), critical=False)
         )
 
-        self.key.load()
+        return csr.sign(self.key.load(), hashes.SHA256())
 
-        cert = csr.sign(self.key.pvt, hashes.SHA256())
+    @span("CertWrapper.sign_csr")
+    def sign_csr(self, path: Path, csr: x509.CertificateBuilder):
+        cert = self.sign(csr)
 
-        self.meta.certs[path.name] = CertInfo(cert.serial_number, cert.not_valid_after_utc)
+        self.meta.set_cert(path.name, CertInfo(cert.serial_number, cert.not_valid_after_utc))
         self.meta.save()
+        index.record([(path, cert)])
 
         return cert
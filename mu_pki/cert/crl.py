@@ -0,0 +1,117 @@
+import datetime as dt
+import hashlib
+from dataclasses import replace
+from typing import Iterable
+
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization as ser
+
+from mu_pki.globals import G
+
+from . import builder
+from .cert_wrapper import CertWrapper
+from .meta import CRL_EXT, DELTA_CRL_EXT, FILE_MODE, CertInfo, write_atomic
+from .root_ca import iter_ca
+
+BASE_LIFETIME = dt.timedelta(days=7)
+DELTA_LIFETIME = dt.timedelta(days=1)
+# re-sign this long before next_update
+MARGIN = dt.timedelta(hours=6)
+# a new base is signed once the delta grows past this share of it
+DELTA_RATIO = 0.25
+
+
+def file_path(cp: CertWrapper, delta: bool = False):
+    return G.ROOT_DIR / f"{cp.path}.{DELTA_CRL_EXT if delta else CRL_EXT}"
+
+
+def digest(infos: Iterable[CertInfo]):
+    h = hashlib.sha256()
+    for info in sorted(infos, key=lambda i: i.id):
+        h.update(f"{info.id:x} {info.rev}\n".encode())
+
+    return h.hexdigest()
+
+
+def _rev(info: CertInfo):
+    return info.rev or G.T_ORIGIN
+
+
+def _sign(
+    cp: CertWrapper,
+    no: int,
+    infos: list[CertInfo],
+    now: dt.datetime,
+    lifetime: dt.timedelta,
+    ext: x509.DeltaCRLIndicator | x509.FreshestCRL,
+):
+    revoked = [
+        x509.RevokedCertificateBuilder().serial_number(info.id).revocation_date(_rev(info)).build()
+        for info in infos
+    ]
+    # passing the whole list at once, as `add_revoked_certificate` copies it on every call
+    crl = (
+        x509.CertificateRevocationListBuilder(revoked_certificates=revoked)
+        .issuer_name(cp.cert.subject)
+        .last_update(now)
+        .next_update(now + lifetime)
+        .add_extension(x509.CRLNumber(no), critical=False)
+        .add_extension(
+            x509.AuthorityKeyIdentifier.from_issuer_subject_key_identifier(cp.skid),
+            critical=False,
+        )
+        .add_extension(ext, critical=isinstance(ext, x509.DeltaCRLIndicator))
+    )
+
+    return crl.sign(cp.key.load(), hashes.SHA256())
+
+
+def _write(cp: CertWrapper, delta: bool, crl: x509.CertificateRevocationList):
+    write_atomic(file_path(cp, delta), crl.public_bytes(ser.Encoding.DER), FILE_MODE)
+
+
+def build(cp: CertWrapper, force: bool = False):
+    """(re-)sign the crls of a ca if its revocations changed or they are about to expire"""
+    now = dt.datetime.now(tz=dt.timezone.utc)
+    meta = cp.meta
+    meta.clean_crl()
+
+    state = replace(meta.crl_state)
+    revoked = meta.crl
+    revoked_digest = digest(revoked)
+    is_fresh = (
+        now < state.next - MARGIN and file_path(cp).is_file() and file_path(cp, True).is_file()
+    )
+    if not force and is_fresh and revoked_digest == state.digest:
+        return False
+
+    base = [info for info in revoked if _rev(info) <= state.base_at]
+    delta = [info for info in revoked if state.base_at < _rev(info)]
+    if (
+        force
+        or state.base_no == 0
+        or state.base_at + BASE_LIFETIME - MARGIN <= now
+        or len(base) * DELTA_RATIO < len(delta)
+    ):
+        state.no += 1
+        state.base_no = state.no
+        state.base_at = now
+        base_ext = builder.freshest_crl(cp.path)
+        _write(cp, False, _sign(cp, state.no, revoked, now, BASE_LIFETIME, base_ext))
+        delta = []
+
+    state.no += 1
+    delta_ext = x509.DeltaCRLIndicator(state.base_no)
+    _write(cp, True, _sign(cp, state.no, delta, now, DELTA_LIFETIME, delta_ext))
+
+    state.next = now + DELTA_LIFETIME
+    state.digest = revoked_digest
+    meta.crl_state = state
+    meta.save()
+
+    return True
+
+
+def build_all(root: CertWrapper, force: bool = False):
+    return [cp for cp in iter_ca(root) if build(cp, force)]
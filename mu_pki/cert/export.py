@@ -0,0 +1,108 @@
+import io
+import tarfile
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Literal
+
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization as ser
+from cryptography.hazmat.primitives.serialization import pkcs12
+
+from mu_pki.trace import span
+
+from .cert_wrapper import CertWrapper
+from .root_ca import iter_ca
+
+Format = Literal["pem", "fullchain", "der", "p12"]
+
+FORMAT_EXT: dict[Format, str] = {
+    "pem": "crt",
+    "fullchain": "fullchain.pem",
+    "der": "der",
+    "p12": "p12",
+}
+CERT_MODE = 0o644
+KEY_MODE = 0o600
+CHAINS_MAX = 256
+# zlib default, 9 (that of tarfile) is about twice as slow for a few % smaller
+COMPRESS_LEVEL = 6
+
+# ca path -> (sha256 of the ca, its chain, the pem of it), so that the leaves of a ca share it
+_chains: OrderedDict[Path, tuple[bytes, list[x509.Certificate], bytes]] = OrderedDict()
+
+
+def chain(ca: CertWrapper):
+    """the ca and its parents, up to (but without) the root, with their concatenated pem"""
+    if ca.parent is ca:
+        return [], b""
+
+    if (cached := _chains.get(ca.path)) and cached[0] == ca.sha256:
+        _chains.move_to_end(ca.path)
+        return cached[1], cached[2]
+
+    parent_certs, parent_pem = chain(ca.parent)
+    certs = [ca.cert, *parent_certs]
+    pem = ca.cert.public_bytes(ser.Encoding.PEM) + parent_pem
+
+    _chains[ca.path] = (ca.sha256, certs, pem)
+    if CHAINS_MAX < len(_chains):
+        _chains.popitem(last=False)
+
+    return certs, pem
+
+
+@span("export.encode")
+def encode(cp: CertWrapper, fmt: Format, password: bytes | None = None):
+    """`p12` includes the key if there is one, encrypted with `password`, which it requires"""
+    if fmt == "der":
+        return cp.cert.public_bytes(ser.Encoding.DER)
+
+    if fmt == "pem":
+        return cp.cert.public_bytes(ser.Encoding.PEM)
+
+    certs, pem = chain(cp.parent)
+    if fmt == "fullchain":
+        return cp.cert.public_bytes(ser.Encoding.PEM) + pem
+
+    key = cp.key.load() if cp.key.file_path.is_file() else None
+    if key and not password:
+        raise ValueError(
+            "p12 of '{}' holds its private key, a password is required".format(cp.path)
+        )
+
+    enc = ser.BestAvailableEncryption(password) if password else ser.NoEncryption()
+    return pkcs12.serialize_key_and_certificates(cp.name.encode(), key, cp.cert, certs, enc)
+
+
+def iter_leaves(ca: CertWrapper):
+    """the (unrevoked and present) leaves of the subtree of `ca`, ca by ca"""
+    for issuer in iter_ca(ca):
+        meta = issuer.meta
+        names = (n for n, i in meta.certs.items() if i.id not in meta.ca and i.id not in meta.miss)
+        for name in sorted(names):
+            cp = issuer.get_child(name)
+            cp.read()
+            yield cp
+
+
+def write_tar(ca: CertWrapper, out: BinaryIO, fmt: Format, password: bytes | None = None):
+    """stream the leaves of the subtree of `ca` into a gzipped tarball, returns how many
+
+    members are named `<cert path>.<format ext>`; cas are left out, their keys should not
+    travel with those of the services
+    """
+    count = 0
+    with tarfile.open(
+        fileobj=out, mode="w|gz", format=tarfile.GNU_FORMAT, compresslevel=COMPRESS_LEVEL
+    ) as tar:
+        for cp in iter_leaves(ca):
+            data = encode(cp, fmt, password)
+
+            member = tarfile.TarInfo(f"{cp.path}.{FORMAT_EXT[fmt]}")
+            member.size = len(data)
+            member.mtime = int(cp.cert.not_valid_before_utc.timestamp())
+            member.mode = KEY_MODE if fmt == "p12" else CERT_MODE
+            tar.addfile(member, io.BytesIO(data))
+            count += 1
+
+    return count
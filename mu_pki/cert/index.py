@@ -0,0 +1,173 @@
+import datetime as dt
+import sqlite3
+from functools import cache
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable
+
+from cryptography import x509
+from cryptography.x509.extensions import ExtensionNotFound
+
+from mu_pki.globals import G
+
+if TYPE_CHECKING:
+    from .cert_wrapper import CertWrapper
+
+FILE_NAME = "index.sqlite3"
+
+# serials are up to 159 bits, so they are kept as hex text
+# timestamps are utc iso strings, which sort in chronological order
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS cert (
+    serial TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    dir TEXT NOT NULL,
+    issuer_skid BLOB,
+    skid BLOB,
+    subject TEXT NOT NULL,
+    ekus TEXT NOT NULL,
+    nbf TEXT NOT NULL,
+    exp TEXT NOT NULL,
+    revoked INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS cert_path ON cert (path);
+CREATE INDEX IF NOT EXISTS cert_dir ON cert (dir);
+CREATE INDEX IF NOT EXISTS cert_issuer_skid ON cert (issuer_skid);
+CREATE INDEX IF NOT EXISTS cert_skid ON cert (skid);
+CREATE INDEX IF NOT EXISTS cert_exp ON cert (exp);
+"""
+
+
+@cache
+def connect(root_dir: Path):
+    conn = sqlite3.connect(root_dir / FILE_NAME, timeout=30)
+    conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.executescript(SCHEMA)
+
+    return conn
+
+
+def _ext(cert: x509.Certificate, cls: type[x509.ExtensionType]):
+    try:
+        return cert.extensions.get_extension_for_class(cls).value
+    except ExtensionNotFound:
+        return None
+
+
+def _row(path: Path, cert: x509.Certificate):
+    akid = _ext(cert, x509.AuthorityKeyIdentifier)
+    skid = _ext(cert, x509.SubjectKeyIdentifier)
+    ekus = _ext(cert, x509.ExtendedKeyUsage)
+
+    return (
+        f"{cert.serial_number:x}",
+        path.as_posix(),
+        path.parent.as_posix(),
+        akid.key_identifier if akid else None,  # type: ignore
+        skid.digest if skid else None,  # type: ignore
+        cert.subject.rfc4514_string(),
+        " ".join(eku.dotted_string for eku in ekus) if ekus else "",  # type: ignore
+        cert.not_valid_before_utc.isoformat(),
+        cert.not_valid_after_utc.isoformat(),
+    )
+
+
+def record(certs: Iterable[tuple[Path, x509.Certificate]]):
+    if not G.INDEX:
+        return
+
+    rows = [_row(path, cert) for path, cert in certs]
+    with connect(G.ROOT_DIR) as conn:
+        # superseded certs are dropped, revoked ones are kept for crl / ocsp lookups
+        conn.executemany(
+            "DELETE FROM cert WHERE path = ? AND serial != ? AND revoked = 0",
+            ((row[1], row[0]) for row in rows),
+        )
+        conn.executemany(
+            "INSERT INTO cert (serial, path, dir, issuer_skid, skid, subject, ekus, nbf, exp) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (serial) DO UPDATE SET path = excluded.path, dir = excluded.dir",
+            rows,
+        )
+
+
+def sync_dir(dir: Path, existing: Iterable[str], revoked: Iterable[int]):
+    """forget certs whose files are gone from `dir`, and flag the revoked ones"""
+    if not G.INDEX:
+        return
+
+    paths = {(dir / name).as_posix() for name in existing}
+    with connect(G.ROOT_DIR) as conn:
+        stale = [
+            (row["serial"],)
+            for row in conn.execute(
+                "SELECT serial, path FROM cert WHERE dir = ? AND revoked = 0", (dir.as_posix(),)
+            )
+            if row["path"] not in paths
+        ]
+        conn.executemany("DELETE FROM cert WHERE serial = ?", stale)
+
+    mark_revoked(revoked)
+
+
+def mark_revoked(ids: Iterable[int]):
+    if not G.INDEX:
+        return
+
+    with connect(G.ROOT_DIR) as conn:
+        conn.executemany(
+            "UPDATE cert SET revoked = 1 WHERE serial = ?", ((f"{id:x}",) for id in ids)
+        )
+
+
+def rebuild(root: "CertWrapper"):
+    with connect(G.ROOT_DIR) as conn:
+        conn.execute("DELETE FROM cert")
+
+    def walk(cp: "CertWrapper"):
+        children = [cp.get_child(name) for name in sorted(cp.meta.list_dir())]
+        for sub_cp in children:
+            sub_cp.load()
+
+        record((sub_cp.path, sub_cp.cert) for sub_cp in children)
+        sync_dir(cp.path, (sub_cp.name for sub_cp in children), (i.id for i in cp.meta.crl))
+
+        for sub_cp in children:
+            if sub_cp.isCA:
+                walk(sub_cp)
+
+    record([(root.path, root.cert)])
+    walk(root)
+
+
+# --- lookups ---
+def find_serial(serial: int):
+    return (
+        connect(G.ROOT_DIR)
+        .execute("SELECT * FROM cert WHERE serial = ?", (f"{serial:x}",))
+        .fetchone()
+    )
+
+
+def find_skid(skid: bytes):
+    return connect(G.ROOT_DIR).execute("SELECT * FROM cert WHERE skid = ?", (skid,)).fetchall()
+
+
+def issued_by(skid: bytes):
+    return (
+        connect(G.ROOT_DIR)
+        .execute("SELECT * FROM cert WHERE issuer_skid = ? ORDER BY path", (skid,))
+        .fetchall()
+    )
+
+
+def expiring_before(t: dt.datetime):
+    return (
+        connect(G.ROOT_DIR)
+        .execute(
+            "SELECT * FROM cert WHERE exp < ? AND revoked = 0 ORDER BY exp",
+            (t.astimezone(dt.timezone.utc).isoformat(),),
+        )
+        .fetchall()
+    )
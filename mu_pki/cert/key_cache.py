@@ -0,0 +1,88 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+
+from cryptography.hazmat.primitives.asymmetric.types import CertificateIssuerPrivateKeyTypes
+
+from mu_pki.globals import G
+
+# longest an expired key lingers, when nothing touches the cache
+SWEEP_INTERVAL = 60
+
+
+class Entry:
+    """holder shared by every `KeyWrapper` of the same key, emptied on eviction"""
+
+    __slots__ = ("key", "used")
+
+    def __init__(self, key: CertificateIssuerPrivateKeyTypes) -> None:
+        self.key: CertificateIssuerPrivateKeyTypes | None = key
+        self.used = time.monotonic()
+
+
+# key file path + skid -> entry, least recently used first
+_entries: OrderedDict[tuple[Path, bytes], Entry] = OrderedDict()
+_lock = threading.Lock()
+_sweeper: threading.Thread | None = None
+
+
+def _expire(now: float):
+    deadline = now - G.KEY_TTL
+    while _entries:
+        entry = next(iter(_entries.values()))
+        if len(_entries) <= G.KEY_CACHE_SIZE and deadline < entry.used:
+            break
+
+        _entries.popitem(last=False)[1].key = None
+
+
+def _sweep():
+    while True:
+        time.sleep(min(G.KEY_TTL, SWEEP_INTERVAL))
+        with _lock:
+            _expire(time.monotonic())
+
+
+def _after_fork():
+    global _lock, _sweeper
+    _lock = threading.Lock()
+    _sweeper = None
+
+
+os.register_at_fork(after_in_child=_after_fork)
+
+
+def get(id: tuple[Path, bytes]):
+    now = time.monotonic()
+    with _lock:
+        _expire(now)
+        if entry := _entries.get(id):
+            entry.used = now
+            _entries.move_to_end(id)
+
+        return entry
+
+
+def put(id: tuple[Path, bytes], entry: Entry):
+    if G.KEY_TTL <= 0:
+        return
+
+    global _sweeper
+    with _lock:
+        _entries[id] = entry
+        _entries.move_to_end(id)
+        _expire(entry.used)
+
+        if not _sweeper:
+            _sweeper = threading.Thread(target=_sweep, daemon=True)
+            _sweeper.start()
+
+
+def lock_all():
+    with _lock:
+        for entry in _entries.values():
+            entry.key = None
+
+        _entries.clear()
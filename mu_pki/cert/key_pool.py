@@ -0,0 +1,157 @@
+import errno
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from cryptography import x509
+from cryptography.hazmat.primitives.asymmetric import ec
+
+from mu_pki.globals import G
+
+from . import safe_storage
+
+POOL_NAME = ".key-pool"
+FOLDER_MODE = 0o700
+FILE_MODE = 0o600
+# refilled in the background only while the 1-minute load per cpu stays below this
+IDLE_LOAD = 0.5
+IDLE_CHECK = 5.0
+
+log = logging.getLogger(__name__)
+
+_refill: threading.Thread | None = None
+# set once the pool turned out to be on another filesystem than the store
+_cross_device = False
+# listed once, and again when used up, instead of on every claim
+_candidates: list[Path] = []
+_candidates_lock = threading.Lock()
+
+
+def pool_dir():
+    return G.KEY_POOL_DIR or G.ROOT_DIR / POOL_NAME
+
+
+def _keys():
+    """pooled key files, named by the hex skid their encryption is bound to"""
+    try:
+        with os.scandir(pool_dir()) as entries:
+            return [Path(e.path) for e in entries if e.name.endswith(".key")]
+
+    except FileNotFoundError:
+        return []
+
+
+def size():
+    return len(_keys())
+
+
+def put_one():
+    key = ec.generate_private_key(G.EC_CURVE)
+    skid = x509.SubjectKeyIdentifier.from_public_key(key.public_key()).key_identifier
+
+    dir = pool_dir()
+    tmp_path = dir / f".{skid.hex()}.tmp"
+    with os.fdopen(os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL, FILE_MODE), "wb") as fp:
+        safe_storage.write_key(fp, key, skid)
+
+    # only complete keys are ever seen by `claim`
+    os.rename(tmp_path, dir / f"{skid.hex()}.key")
+
+
+def fill(target: int | None = None):
+    """generate keys until `target` (default: `KEY_POOL`) are pooled, returns how many"""
+    pool_dir().mkdir(mode=FOLDER_MODE, parents=True, exist_ok=True)
+
+    count = max(0, (G.KEY_POOL if target is None else target) - size())
+    for _ in range(count):
+        put_one()
+
+    return count
+
+
+def claim(dest: Path):
+    """move a pooled key to `dest`, which must not exist, returns it, None if the pool is empty
+
+    each key is first renamed to a name of this thread, so that no two callers could get it
+    """
+    global _cross_device
+
+    if G.KEY_POOL <= 0 or _cross_device:
+        return None
+
+    while src := _next_candidate():
+        claimed = src.with_name(f"{src.stem}.{os.getpid()}-{threading.get_ident()}.claim")
+        try:
+            os.rename(src, claimed)
+        except FileNotFoundError:
+            # claimed by someone else
+            continue
+
+        try:
+            with claimed.open("rb") as fp:
+                key, _ = safe_storage.read_key(fp, bytes.fromhex(src.stem))
+
+            os.link(claimed, dest)
+
+        except OSError as e:
+            os.rename(claimed, src)
+            if e.errno != errno.EXDEV:
+                raise
+
+            # keys could only be linked within a filesystem, the caller generates one instead
+            log.warning("key pool %s is not on the filesystem of the store, unused", pool_dir())
+            _cross_device = True
+            return None
+
+        except Exception:
+            os.rename(claimed, src)
+            raise
+
+        claimed.unlink()
+        return key
+
+    return None
+
+
+def _next_candidate():
+    with _candidates_lock:
+        if not _candidates:
+            _candidates.extend(_keys())
+
+        return _candidates.pop() if _candidates else None
+
+
+def _idle():
+    try:
+        return os.getloadavg()[0] / (os.cpu_count() or 1) < IDLE_LOAD
+    except (AttributeError, OSError):
+        # no load average on this platform
+        return True
+
+
+def _run_refill():
+    while True:
+        try:
+            if size() < G.KEY_POOL and _idle():
+                pool_dir().mkdir(mode=FOLDER_MODE, parents=True, exist_ok=True)
+                put_one()
+                continue
+
+        except Exception:
+            # e.g. a full disk, retried later rather than leaving the pool to drain
+            log.exception("refilling the key pool %s failed", pool_dir())
+
+        time.sleep(IDLE_CHECK)
+
+
+def start_refill():
+    """keep the pool filled from a daemon thread, while the machine is idle"""
+    global _refill
+
+    if G.KEY_POOL <= 0 or (_refill and _refill.is_alive()):
+        return
+
+    _refill = threading.Thread(target=_run_refill, name="key-pool", daemon=True)
+    _refill.start()
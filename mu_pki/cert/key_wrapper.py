@@ -7,11 +7,12 @@ from cryptography.hazmat.primitives.asymmetric import ec
 from cryptography.hazmat.primitives.asymmetric.types import CertificateIssuerPrivateKeyTypes
 
 from mu_pki.globals import G
+from mu_pki.trace import span
 
-from . import safe_storage
+from . import key_cache, key_pool, safe_storage
 
 KEY_EXT = "key"
-FILE_MODE = 0x740
+FILE_MODE = 0o640
 
 
 class KeyWrapper:
@@ -19,18 +20,29 @@ class KeyWrapper:
         self.path = path
         self.tag = tag
 
-        self.pvt: CertificateIssuerPrivateKeyTypes = None  # type: ignore
+        self._entry: key_cache.Entry | None = None
 
     def __bool__(self):
         return bool(self.pvt)
 
+    @property
+    def pvt(self) -> CertificateIssuerPrivateKeyTypes:
+        """`None` until loaded, and again once evicted from the key cache"""
+        return self._entry.key if self._entry else None  # type: ignore
+
+    @property
+    def cache_id(self):
+        return self.file_path, self.aad
+
     @cached_property
     def file_path(self):
         return G.ROOT_DIR / f"{self.path}.{KEY_EXT}"
 
-    @cached_property
+    @property
     def pem(self):
-        return self.pvt.private_bytes(ser.Encoding.PEM, ser.PrivateFormat.PKCS8, ser.NoEncryption())
+        return self.load().private_bytes(
+            ser.Encoding.PEM, ser.PrivateFormat.PKCS8, ser.NoEncryption()
+        )
 
     @cached_property
     def pub(self):
@@ -53,9 +65,13 @@ class KeyWrapper:
 
         self.file_path.chmod(FILE_MODE)
 
-    def load(self):
-        if self.pvt:
-            return
+    @span("KeyWrapper.load")
+    def load(self) -> CertificateIssuerPrivateKeyTypes:
+        """the decrypted key, to be used rather than `pvt`, which the cache could empty anytime"""
+        entry = key_cache.get(self.cache_id) or self._entry
+        if entry and (pvt := entry.key):
+            self._entry = entry
+            return pvt
 
         if not self.file_path.is_file():
             raise FileNotFoundError(
@@ -64,14 +80,31 @@ class KeyWrapper:
 
         self.file_path.chmod(FILE_MODE)
         with self.file_path.open("rb") as fp:
-            self.pvt, need_upgrade = safe_storage.read_key(fp, self.aad)
+            pvt, need_upgrade = safe_storage.read_key(fp, self.aad)
 
+        # not shared before dumped, so that it could not be evicted meanwhile
+        self._entry = key_cache.Entry(pvt)
         if need_upgrade:
             self.dump()
 
-    def generate(self):
+        key_cache.put(self.cache_id, self._entry)
+        return pvt
+
+    def generate(self) -> CertificateIssuerPrivateKeyTypes:
+        """returns the new key, its `pub` and `skid` are kept even once evicted"""
         if self.file_path.is_file():
             raise FileExistsError(("Key '{}' exists.").format(self.path))
 
-        self.pvt = ec.generate_private_key(G.EC_CURVE)
-        self.dump()
+        # pooled keys are stored encrypted under their skid already, i.e. as if dumped untagged
+        claimed = None if self.tag else key_pool.claim(self.file_path)
+        pvt = claimed or ec.generate_private_key(G.EC_CURVE)
+
+        self._entry = key_cache.Entry(pvt)
+        self.pub = pvt.public_key()
+        if claimed:
+            self.file_path.chmod(FILE_MODE)
+        else:
+            self.dump()
+
+        key_cache.put(self.cache_id, self._entry)
+        return pvt
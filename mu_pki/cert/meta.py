@@ -1,27 +1,60 @@
 import datetime as dt
-import difflib
-from copy import deepcopy
-from dataclasses import dataclass
+import json
+import os
+import tomllib
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, is_dataclass
 from pathlib import Path
-from typing import TYPE_CHECKING, Mapping, Sequence, overload
+from typing import TYPE_CHECKING, Iterable, Literal, Mapping
 
 import pydantic as pd
-import tomlkit
-from tomlkit import items as tomlitems
-from tomlkit.container import Container as TomlContainer
+from cryptography import x509
+
+from mu_pki.globals import G
+from mu_pki.trace import span
+
+from . import index
 
 if TYPE_CHECKING:
+    import tomlkit
+
     from .cert_wrapper import CertWrapper
 
 FILE_NAME = "meta.toml"
+CACHE_NAME = ".meta-cache.json"
 FILE_MODE = 0o644
 CRT_EXT = "crt"
+CRL_EXT = "crl"
+DELTA_CRL_EXT = "delta.crl"
 
 
-@dataclass
+def write_atomic(file_path: Path, data: bytes, mode: int):
+    """write via a temp file, so that a crash never leaves a truncated file behind"""
+    tmp_path = file_path.with_name(f".{file_path.name}.tmp")
+    with tmp_path.open("wb") as fp:
+        fp.write(data)
+        fp.flush()
+        os.fsync(fp.fileno())
+
+    tmp_path.chmod(mode)
+    tmp_path.replace(file_path)
+
+    if os.name == "posix":
+        # make the rename itself durable
+        dir_fd = os.open(file_path.parent, os.O_RDONLY)
+        try:
+            os.fsync(dir_fd)
+        finally:
+            os.close(dir_fd)
+
+
+@dataclass(slots=True)
 class CertInfo:
     id: int
     exp: dt.datetime
+    # revocation time, only for records in the crl
+    rev: dt.datetime | None = None
 
     def __eq__(self, value: object) -> bool:
         if not isinstance(value, CertInfo):
@@ -33,26 +66,80 @@ class CertInfo:
         return self.id.__hash__()
 
 
-def apply_sequence_diff(toml: tomlitems.Array, original: Sequence, current: Sequence):
-    # TODO: comments / reordering support
-    diff = difflib.SequenceMatcher(None, original, current)
-    toml.multiline(True)
-    for _, ref_s, _, s, e in (op for op in diff.get_opcodes() if op[0] == "insert"):
-        for i in range(e, s, -1):
-            toml.insert(ref_s, current[i - 1])
+@dataclass(slots=True)
+class CertSummary:
+    """what `Meta.update` needs to know about a child cert, keyed by its file fingerprint"""
+
+    fp: tuple[int, int, int]
+    id: int
+    exp: dt.datetime
+    skid: bytes
+    akid: bytes | None
+    isCA: bool
+    # for searching
+    sub: str
+
+    @staticmethod
+    def fingerprint(st: os.stat_result):
+        return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+    @staticmethod
+    def from_raw(raw: list):
+        fp, id, exp, skid, akid, isCA, sub = raw
+        return CertSummary(
+            tuple(fp),
+            id,
+            dt.datetime.fromisoformat(exp),
+            bytes.fromhex(skid),
+            bytes.fromhex(akid) if akid is not None else None,
+            isCA,
+            sub,
+        )
+
+    def to_raw(self):
+        akid = self.akid.hex() if self.akid is not None else None
+        return [self.fp, self.id, self.exp.isoformat(), self.skid.hex(), akid, self.isCA, self.sub]
+
+
+@dataclass
+class CrlState:
+    no: int = 0
+    base_no: int = 0
+    base_at: dt.datetime = G.T_ORIGIN
+    # next_update of the latest delta crl
+    next: dt.datetime = G.T_ORIGIN
+    digest: str = ""
+
+
+def _plain(val) -> dict:
+    return {k: v for k, v in asdict(val).items() if v is not None}
+
+
+def _key(val):
+    """identity of an element of the `ca`, `miss`, `crl` and `ekus` arrays"""
+    if isinstance(val, CertInfo):
+        return val.id
+
+    if isinstance(val, Mapping):
+        return val["id"]
 
-    for _, ref_s, ref_e, s, e in (op for op in diff.get_opcodes() if op[0] == "replace"):
-        for i, j in zip(range(ref_e, ref_s, -1), range(e, s, -1)):
-            toml[i - 1] = current[j - 1]
+    return val
 
-    pending_del = [op for op in diff.get_opcodes() if op[0] == "delete"]
-    pending_del.reverse()
-    for _, ref_s, ref_e, _, _ in pending_del:
-        for i in range(ref_e, ref_s, -1):
-            toml.pop(i - 1)
+
+def _inline(val):
+    import tomlkit
+
+    if not is_dataclass(val):
+        return val
+
+    table = tomlkit.inline_table()
+    table.update(_plain(val))
+    return table
 
 
 def toml_from_dict(data: Mapping):
+    import tomlkit
+
     toml = tomlkit.table()
     for k, v in data.items():
         if isinstance(v, Mapping):
@@ -63,47 +150,38 @@ def toml_from_dict(data: Mapping):
     return toml
 
 
-# inspired by https://pypi.org/project/tomlantic/
-@overload
-def apply_model_diff(
-    toml: TomlContainer | tomlitems.Table, original: Sequence, current: Sequence
-) -> None: ...
-@overload
-def apply_model_diff(
-    toml: TomlContainer | tomlitems.Table, original: Mapping, current: Mapping
-) -> None: ...
-def apply_model_diff(toml, original, current) -> None:
-    for field in current.keys():
-        val = current[field]
-        if field not in original:
-            toml[field] = toml_from_dict(val)
-            continue
-
-        ref = original[field]
-        if isinstance(val, Mapping):
-            if field not in toml:
-                toml[field] = tomlkit.table()
+def toml_array(items: Iterable):
+    import tomlkit
 
-            toml_part = toml[field]
-            apply_model_diff(toml_part, ref, val)
+    toml = tomlkit.array()
+    toml.multiline(True)
+    for item in items:
+        toml.append(_inline(item))
 
-        elif isinstance(val, Sequence):
-            if field not in toml:
-                toml[field] = tomlkit.array()
+    return toml
 
-            toml_part = toml[field]
-            apply_sequence_diff(toml_part, ref, val)
 
-        elif val != ref:
-            toml.update({field: val})
+# marks an element removed from an array
+_REMOVED = object()
 
 
 class Meta(pd.BaseModel):
+    """mutate `certs`, `ca`, `miss` and `crl` through the methods below, so that `save` only
+    applies the changes to the toml document, fields could also be replaced as a whole
+    """
+
     model_config = pd.ConfigDict(validate_assignment=True)
-    _origin: dict
-    _toml: tomlkit.TOMLDocument
+    # only parsed (and tomlkit only imported) on the first save, as tomlkit is way slower
+    _toml: "tomlkit.TOMLDocument | None" = None
     _cp: "CertWrapper"
     _file_path: Path
+    _cache: dict[str, CertSummary]
+    _cache_dirty: bool = False
+    _batch: int = 0
+    # field -> {key -> element or `_REMOVED`}, or None if replaced as a whole
+    _changed: dict[str, dict | None] = pd.PrivateAttr(default_factory=dict)
+    # bumped on every change, saved or not
+    _version: int = 0
 
     certs: dict[str, CertInfo] = pd.Field(default_factory=dict)
     ca: list[int] = pd.Field(default_factory=list)
@@ -112,91 +190,313 @@ class Meta(pd.BaseModel):
 
     ekus: list[str] = pd.Field(default_factory=list)
 
+    crl_state: CrlState = pd.Field(default_factory=CrlState)
+
     @staticmethod
     def init_from(cp: "CertWrapper"):
         file_path = cp.sub_dir / FILE_NAME
         if not file_path.is_file():
-            toml_doc = tomlkit.document()
+            # written as a whole on the first save
+            model = Meta()
 
         else:
-            with file_path.open("r") as fp:
-                toml_doc = tomlkit.load(fp)
+            with file_path.open("rb") as fp:
+                model = Meta.model_validate(tomllib.load(fp))
 
-        model = Meta.model_validate(toml_doc.unwrap())
-        model._origin = model.model_dump()
-        model._toml = toml_doc
         model._cp = cp
         model._file_path = file_path
+        model._cache = model.load_cache()
 
         return model
 
+    def __setattr__(self, name: str, value) -> None:
+        super().__setattr__(name, value)
+        if name in Meta.model_fields:
+            self._changed[name] = None
+            self._version += 1
+
+    @property
+    def version(self):
+        return self._version
+
+    def _track(self, field: str, key, item):
+        self._version += 1
+        changed = self._changed.setdefault(field, {})
+        if changed is None:
+            return
+
+        if field != "certs" and key in changed and (changed[key] is _REMOVED) != (item is _REMOVED):
+            # undone before being saved
+            del changed[key]
+        else:
+            changed[key] = item
+
+    def set_cert(self, name: str, info: CertInfo):
+        self.certs[name] = info
+        self._track("certs", name, info)
+
+    def pop_cert(self, name: str):
+        info = self.certs.pop(name, None)
+        if info:
+            self._track("certs", name, _REMOVED)
+
+        return info
+
+    def add(self, field: Literal["ca", "miss", "crl"], item):
+        items: list = getattr(self, field)
+        if item not in items:
+            items.append(item)
+            self._track(field, _key(item), item)
+
+    def discard(self, field: Literal["ca", "miss", "crl"], item):
+        items: list = getattr(self, field)
+        if item in items:
+            items.remove(item)
+            self._track(field, _key(item), _REMOVED)
+
+    @property
+    def cache_path(self):
+        return self._file_path.with_name(CACHE_NAME)
+
+    def load_cache(self) -> dict[str, CertSummary]:
+        try:
+            with self.cache_path.open("r") as fp:
+                return {name: CertSummary.from_raw(raw) for name, raw in json.load(fp).items()}
+
+        except (OSError, ValueError, TypeError):
+            # a missing or broken cache only costs a full scan
+            return {}
+
+    def save_cache(self):
+        raw = {name: summary.to_raw() for name, summary in self._cache.items()}
+        write_atomic(self.cache_path, json.dumps(raw).encode(), FILE_MODE)
+        self._cache_dirty = False
+
+    def read_summary(
+        self, name: str, fp: tuple[int, int, int]
+    ) -> tuple[CertSummary, x509.Certificate]:
+        sub_cp = self._cp.get_child(name)
+        sub_cp.read()
+        sub_cp.fix_fs()
+
+        akid = sub_cp.akid
+        summary = CertSummary(
+            fp,
+            sub_cp.cert.serial_number,
+            sub_cp.cert.not_valid_after_utc,
+            sub_cp.skid.key_identifier,
+            akid.key_identifier if akid else None,
+            sub_cp.isCA,
+            str(sub_cp.sub),
+        )
+        return summary, sub_cp.cert
+
+    def list_dir(self):
+        """fingerprints of the child certs, by name, loose files win over the pack"""
+        fps = {}
+        # created or dropped by other processes meanwhile
+        if pack := self._cp.refresh_pack():
+            fps.update(pack.fingerprints())
+
+        suffix = f".{CRT_EXT}"
+        with os.scandir(self._cp.sub_dir) as entries:
+            fps.update(
+                (e.name.removesuffix(suffix), CertSummary.fingerprint(e.stat()))
+                for e in entries
+                if e.name.endswith(suffix) and not e.name.startswith(".") and e.is_file()
+            )
+
+        return fps
+
+    def sub(self, name: str):
+        """subject of a child cert as of the last update, empty if unknown"""
+        summary = self._cache.get(name)
+        return summary.sub if summary else ""
+
+    def rekey_cache(self):
+        """keep the summaries over a change of the layout, which moves but never changes certs"""
+        for name, fp in self.list_dir().items():
+            if summary := self._cache.get(name):
+                summary.fp = fp
+
+        self.save_cache()
+
+    def scan(self, fps: dict[str, tuple[int, int, int]]):
+        """summaries of the child certs, only those changed since cached are parsed
+
+        fingerprints must be taken before reading, so a file changed meanwhile is re-read next time
+        """
+        stale = [n for n, fp in fps.items() if (c := self._cache.get(n)) is None or c.fp != fp]
+
+        if 1 < len(stale):
+            with ThreadPoolExecutor() as pool:
+                parsed = list(pool.map(self.read_summary, stale, (fps[n] for n in stale)))
+        else:
+            parsed = [self.read_summary(n, fps[n]) for n in stale]
+
+        self._cache.update((n, summary) for n, (summary, _) in zip(stale, parsed))
+        self._cache_dirty |= bool(stale)
+        index.record((self._cp.path / n, cert) for n, (_, cert) in zip(stale, parsed))
+
+        return {name: self._cache[name] for name in fps}
+
     def clean_extra(self):
         known = {v.id for _, v in self.certs.items()}
-        self.ca = list(set(self.ca) & known)
-        self.miss = list(set(self.miss) & known)
+        for field in ("ca", "miss"):
+            for id in [id for id in getattr(self, field) if id not in known]:
+                self.discard(field, id)
 
     def clean_crl(self):
-        now = dt.datetime.now()
-        expired_info = {info for info in self.crl if info.exp < now}
-        self.crl = list(set(self.crl) - expired_info)
+        now = dt.datetime.now(tz=dt.timezone.utc)
+        for info in [info for info in self.crl if info.exp < now]:
+            self.discard("crl", info)
 
+    def revoke(self, name: str):
+        info = self.certs[name]
+        self.pop_cert(name)
+        self.add("crl", CertInfo(info.id, info.exp, dt.datetime.now(tz=dt.timezone.utc)))
+        self.save()
+        index.mark_revoked([info.id])
+
+    @span("Meta.update")
     def update(self):
-        now = dt.datetime.now(tz=dt.timezone.utc)
+        # renewals of expired certs would otherwise save one by one
+        with self.batch():
+            now = dt.datetime.now(tz=dt.timezone.utc)
+
+            known = set(self.certs)
+            fps = self.list_dir()
+            existing = fps.keys()
+            missing = set(self.miss)
+            missing.update(self.certs[name].id for name in (known - existing))
+            revoked = {info.id for info in self.crl}
+            cas = set(self.ca)
+
+            for name, summary in sorted(self.scan(fps).items()):
+                if summary.akid and summary.akid != self._cp.skid.key_identifier:
+                    raise ValueError("cert '{}' is from an unknown ca".format(self._cp.path / name))
+
+                info = CertInfo(summary.id, summary.exp)
+                if info.id in revoked:
+                    self.pop_cert(name)
+                    continue
+
+                if summary.exp < now:
+                    sub_cp = self._cp.get_child(name)
+                    sub_cp.load()
+                    sub_cp.renew()
+                    continue
+
+                # renamed, id must be the same as searched via recorded id
+                if info.id in missing:
+                    missing.remove(info.id)
+
+                # record valid but missmatch
+                elif (record := self.certs.get(name)) is not None and record != info:
+                    self.add("crl", CertInfo(record.id, record.exp, now))
+
+                if self.certs.get(name) != info:
+                    self.set_cert(name, info)
+
+                if summary.isCA and info.id not in cas:
+                    self.add("ca", info.id)
+
+                elif not summary.isCA and info.id in cas:
+                    self.discard("ca", info.id)
+
+            for id in set(self.miss) - missing:
+                self.discard("miss", id)
+
+            for id in missing:
+                self.add("miss", id)
+
+            # clean renamed record
+            for name in [n for n in (known - existing) if self.certs[n].id not in missing]:
+                self.pop_cert(name)
+
+            self.clean_crl()
+            self.clean_extra()
+            self.save()
+
+        index.sync_dir(self._cp.path, existing, (info.id for info in self.crl))
+
+        # drop deleted files
+        for name in self._cache.keys() - existing:
+            self._cache.pop(name)
+            self._cache_dirty = True
+
+        if self._cache_dirty:
+            self.save_cache()
+
+    @contextmanager
+    def batch(self):
+        """defer all saves within, to a single one at the end"""
+        self._batch += 1
+        try:
+            yield self
+
+        finally:
+            self._batch -= 1
+            if not self._batch and self._changed:
+                self.save()
+
+    @span("Meta.save")
+    def save(self):
+        if self._batch:
+            return
 
-        known = {n for n in self.certs.keys()}
-        existing = {p.stem for p in self._cp.sub_dir.glob(f"*.{CRT_EXT}")}
-        missing = set(self.miss)
-        missing.update(self.certs[name].id for name in (known - existing))
+        if not self._changed and self._file_path.is_file():
+            return
 
-        for name in existing:
-            sub_cp = self._cp.get_child(name)
-            sub_cp.load()
-            if sub_cp.akid and sub_cp.akid.key_identifier != self._cp.skid.key_identifier:
-                raise ValueError("cert '{}' is from an unknown ca".format(sub_cp.path))
+        import tomlkit
 
-            info = CertInfo(sub_cp.cert.serial_number, sub_cp.cert.not_valid_after_utc)
-            if info in self.crl:
-                self.certs.pop(name, None)
-                continue
+        self.apply_changes()
+        write_atomic(self._file_path, tomlkit.dumps(self._toml).encode(), FILE_MODE)
 
-            if sub_cp.cert.not_valid_after_utc < now:
-                sub_cp.renew()
-                continue
+    def apply_changes(self):
+        import tomlkit
 
-            # renamed, id must be the same as searched via recorded id
-            if info.id in missing:
-                missing.remove(info.id)
+        if self._toml is None and self._file_path.is_file():
+            with self._file_path.open("r") as fp:
+                self._toml = tomlkit.load(fp)
 
-            # record valid but missmatch
-            elif (name in known) and ((record := self.certs[name]) != info):
-                self.crl.append(record)
+        elif self._toml is None:
+            # new, or deleted meanwhile, so write everything
+            self._toml = tomlkit.document()
+            self._changed = dict.fromkeys(Meta.model_fields)
 
-            self.certs[name] = info
-            if sub_cp.isCA:
-                self.ca.append(info.id)
+        toml = self._toml
+        for field, changed in self._changed.items():
+            val = getattr(self, field)
+            if changed is None:
+                if field == "certs":
+                    certs = tomlkit.table(is_super_table=True)
+                    for name, info in val.items():
+                        certs[name] = toml_from_dict(_plain(info))
 
-            else:
-                if info.id in self.ca:
-                    self.ca.remove(info.id)
+                    toml[field] = certs
 
-        self.miss = list(missing)
+                elif is_dataclass(val):
+                    toml[field] = toml_from_dict(_plain(val))
 
-        # clean renamed record
-        for name in (n for n in (known - existing) if self.certs[n].id not in missing):
-            self.certs.pop(name)
+                else:
+                    toml[field] = toml_array(val)
 
-        self.clean_crl()
-        self.clean_extra()
-        self.save()
+            elif field == "certs":
+                certs = toml.setdefault(field, tomlkit.table(is_super_table=True))
+                for name in changed:
+                    if (info := val.get(name)) is not None:
+                        certs[name] = toml_from_dict(_plain(info))
+                    elif name in certs:
+                        del certs[name]
 
-    def save(self):
-        toml_doc = deepcopy(self._toml)
-        current_model = self.model_dump()
-        apply_model_diff(toml_doc, self._origin, current_model)
-        self._toml = toml_doc
-        self._origin = current_model
+            else:
+                items = toml.setdefault(field, toml_array([]))
+                removed = {key for key, item in changed.items() if item is _REMOVED}
+                for i in (i for i in range(len(items) - 1, -1, -1) if _key(items[i]) in removed):
+                    del items[i]
 
-        with self._file_path.open("w") as fp:
-            tomlkit.dump(toml_doc, fp)
+                for item in (item for item in changed.values() if item is not _REMOVED):
+                    items.append(_inline(item))
 
-        self._file_path.chmod(FILE_MODE)
+        self._changed = {}
@@ -0,0 +1,237 @@
+import json
+import mmap
+import os
+import struct
+from pathlib import Path
+from typing import TYPE_CHECKING
+
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization as ser
+
+from .meta import CRT_EXT, FILE_MODE, write_atomic
+
+if TYPE_CHECKING:
+    from .cert_wrapper import CertWrapper
+
+PACK_NAME = "certs.pack"
+INDEX_NAME = "certs.pack.idx"
+MAGIC = b"MUPKIPK1"
+# der length (0 for a removed cert), name length, followed by the name, then the der
+HEADER = struct.Struct("<IH")
+
+
+class Pack:
+    """append-only file of the der certs issued by a ca, read through mmap
+
+    later records of the same name win, the index sidecar covers the file up to its `end` and
+    the records appended after are scanned; a loose file of the same name wins over the pack,
+    as it could only have been written since (by a process not aware of the pack yet)
+    """
+
+    def __init__(self, dir: Path) -> None:
+        self.file_path = dir / PACK_NAME
+        self.index_path = dir / INDEX_NAME
+        self.entries: dict[str, tuple[int, int]] = {}
+        self.end = 0
+        self.ino = 0
+        self._mm: mmap.mmap | None = None
+
+    def __contains__(self, name: str):
+        return name in self.entries or (self.refresh() and name in self.entries)
+
+    def close(self):
+        # slices of the map are copies, so nothing handed out refers to it (views could not be
+        # handed out anyway, the loaders of cryptography only take bytes)
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+
+    def _map(self):
+        self.close()
+        with self.file_path.open("rb") as fp:
+            self._mm = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        if self._mm[: len(MAGIC)] != MAGIC:
+            raise ValueError("'{}' is not a cert pack".format(self.file_path))
+
+        return self._mm
+
+    def _load_index(self):
+        try:
+            raw = json.loads(self.index_path.read_bytes())
+        except (OSError, ValueError):
+            raw = {}
+
+        # an index of a replaced (i.e. compacted) file is useless
+        if raw.get("ino") == self.ino:
+            self.entries = {name: (off, size) for name, (off, size) in raw["entries"].items()}
+            self.end = raw["end"]
+        else:
+            self.entries = {}
+            self.end = len(MAGIC)
+
+    def refresh(self):
+        """pick up records appended since, returns whether there were any"""
+        st = self.file_path.stat()
+        if st.st_ino != self.ino:
+            self.ino = st.st_ino
+            self._load_index()
+
+        elif st.st_size <= self.end:
+            return False
+
+        mm = self._map()
+        off = self.end
+        while off + HEADER.size <= len(mm):
+            der_len, name_len = HEADER.unpack_from(mm, off)
+            der_off = off + HEADER.size + name_len
+            if len(mm) < der_off + der_len:
+                # still being appended
+                break
+
+            name = mm[off + HEADER.size : der_off].decode()
+            if der_len:
+                self.entries[name] = (der_off, der_len)
+            else:
+                self.entries.pop(name, None)
+
+            off = der_off + der_len
+
+        self.end = off
+        return True
+
+    def fingerprints(self):
+        return {name: (off, size, 0) for name, (off, size) in self.entries.items()}
+
+    def get(self, name: str):
+        if name not in self:
+            return None
+
+        off, size = self.entries[name]
+        mm = self._mm
+        if mm is None or len(mm) < off + size:
+            mm = self._map()
+
+        return mm[off : off + size]
+
+    def append(self, name: str, der: bytes):
+        """`der` empty for removing"""
+        name_raw = name.encode()
+        record = HEADER.pack(len(der), len(name_raw)) + name_raw + der
+
+        fd = os.open(self.file_path, os.O_WRONLY | os.O_APPEND)
+        try:
+            # a single write, so that appends of other processes never interleave
+            os.write(fd, record)
+            end = os.lseek(fd, 0, os.SEEK_CUR)
+        finally:
+            os.close(fd)
+
+        # not moving `end`, as others may have appended before
+        if der:
+            self.entries[name] = (end - len(der), len(der))
+        else:
+            self.entries.pop(name, None)
+
+    def compact(self, extra: dict[str, bytes] | None = None):
+        """rewrite with only the latest record of each cert (plus `extra`), all indexed
+
+        records appended by other processes meanwhile are lost, so nothing else should issue
+        under this ca while compacting
+        """
+        self.refresh()
+        ders = {name: self.get(name) for name in self.entries} | (extra or {})
+
+        data = bytearray(MAGIC)
+        entries: dict[str, tuple[int, int]] = {}
+        for name, der in sorted(ders.items()):
+            assert der
+            name_raw = name.encode()
+            data += HEADER.pack(len(der), len(name_raw)) + name_raw
+            entries[name] = (len(data), len(der))
+            data += der
+
+        write_atomic(self.file_path, bytes(data), FILE_MODE)
+        self.ino = self.file_path.stat().st_ino
+        self.entries = entries
+        self.end = len(data)
+        self.close()
+
+        index = {"ino": self.ino, "end": self.end, "entries": entries}
+        write_atomic(self.index_path, json.dumps(index).encode(), FILE_MODE)
+
+
+_packs: dict[Path, Pack] = {}
+
+
+def find(dir: Path):
+    """pack in the sub dir of a ca, if it uses one"""
+    if not (dir / PACK_NAME).is_file():
+        _packs.pop(dir, None)
+        return None
+
+    if (pack := _packs.get(dir)) is None:
+        pack = _packs[dir] = Pack(dir)
+
+    pack.refresh()
+    return pack
+
+
+def _same_file(a: os.stat_result, b: os.stat_result):
+    return (a.st_mtime_ns, a.st_size, a.st_ino) == (b.st_mtime_ns, b.st_size, b.st_ino)
+
+
+def pack_certs(cp: "CertWrapper"):
+    """move the loose cert files issued by a ca into its pack (created if needed), and compact it"""
+    cp.meta.update()
+
+    file_path = cp.sub_dir / PACK_NAME
+    if not file_path.is_file():
+        write_atomic(file_path, MAGIC, FILE_MODE)
+
+    # loose files win over the records of the pack, as everywhere else
+    loose: dict[Path, os.stat_result] = {}
+    extra: dict[str, bytes] = {}
+    for crt_path in sorted(cp.sub_dir.glob(f"*.{CRT_EXT}")):
+        loose[crt_path] = crt_path.stat()
+        cert = x509.load_pem_x509_certificate(crt_path.read_bytes())
+        extra[crt_path.stem] = cert.public_bytes(ser.Encoding.DER)
+
+    cp.pack = pk = find(cp.sub_dir)
+    assert pk
+    pk.compact(extra)
+    for crt_path, st in loose.items():
+        # one rewritten meanwhile is newer than its record, and stays
+        if _same_file(crt_path.stat(), st):
+            crt_path.unlink()
+
+    cp.meta.rekey_cache()
+    return len(pk.entries)
+
+
+def unpack_certs(cp: "CertWrapper"):
+    """export the certs of a ca's pack back to loose pem files, and drop the pack"""
+    from .cert_wrapper import FILE_MODE as CRT_MODE
+
+    if (pk := find(cp.sub_dir)) is None:
+        return 0
+
+    cp.meta.update()
+    for name in pk.entries:
+        crt_path = cp.sub_dir / f"{name}.{CRT_EXT}"
+        if crt_path.is_file():
+            # newer than its record
+            continue
+
+        cert = x509.load_der_x509_certificate(pk.get(name))  # type: ignore
+        crt_path.write_bytes(cert.public_bytes(ser.Encoding.PEM))
+        crt_path.chmod(CRT_MODE)
+
+    pk.close()
+    pk.file_path.unlink()
+    pk.index_path.unlink(missing_ok=True)
+    _packs.pop(cp.sub_dir, None)
+    cp.pack = None
+
+    cp.meta.rekey_cache()
+    return len(pk.entries)
@@ -0,0 +1,122 @@
+import hashlib
+import json
+import os
+import tempfile
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cryptography.hazmat.primitives import serialization as ser
+
+from mu_pki.globals import G
+from mu_pki.trace import span
+
+from . import crl
+from .cert_wrapper import CertWrapper
+from .meta import CRT_EXT, FILE_MODE, write_atomic
+from .root_ca import iter_ca
+
+# hashes of what got published, per output dir, kept in the store as the output is served
+MANIFEST_DIR = ".publish"
+FOLDER_MODE = 0o755
+
+
+@dataclass
+class Published:
+    written: list[str] = field(default_factory=list)
+    unchanged: int = 0
+    removed: list[str] = field(default_factory=list)
+
+
+def _files(root: CertWrapper):
+    """url path (relative to `builder.PKI_ENDPOINT`) -> der content, for every ca of the tree"""
+    for cp in iter_ca(root):
+        yield f"{cp.path}.{CRT_EXT}", cp.cert.public_bytes(ser.Encoding.DER)
+
+        for delta in (False, True):
+            file_path = crl.file_path(cp, delta)
+            if file_path.is_file():
+                yield str(file_path.relative_to(G.ROOT_DIR)), file_path.read_bytes()
+
+
+def manifest_path(out_dir: Path):
+    key = hashlib.sha256(str(out_dir.resolve()).encode()).hexdigest()[:16]
+    return G.ROOT_DIR / MANIFEST_DIR / f"{key}.json"
+
+
+def _write_staged(stage_dir: Path, file_path: Path, data: bytes):
+    """as `write_atomic`, but staged in `stage_dir`, so that no temp file is ever served"""
+    fd, tmp_name = tempfile.mkstemp(dir=stage_dir, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as fp:
+            fp.write(data)
+            fp.flush()
+            os.fsync(fp.fileno())
+
+        os.chmod(tmp_name, FILE_MODE)
+        os.replace(tmp_name, file_path)
+
+    except BaseException:
+        Path(tmp_name).unlink(missing_ok=True)
+        raise
+
+    dir_fd = os.open(file_path.parent, os.O_RDONLY)
+    try:
+        os.fsync(dir_fd)
+    finally:
+        os.close(dir_fd)
+
+
+def _load_manifest(file_path: Path) -> dict[str, str]:
+    try:
+        return json.loads(file_path.read_text())
+    except (OSError, ValueError):
+        # a missing or broken manifest only costs a full rewrite
+        return {}
+
+
+@span("publish.publish")
+def publish(root: CertWrapper, out_dir: Path, manifest: Path | None = None):
+    """mirror the issuer certs and crls into `out_dir`, laid out as the aia and cdp urls
+
+    only files whose sha256 differs from the manifest of the last run are (atomically)
+    rewritten, and those of cas gone since are removed, so the others keep their mtime;
+    the manifest (default: under the store) must be outside of `out_dir`, which is served, but
+    on its filesystem, as the files are staged next to it
+    """
+    manifest = manifest or manifest_path(out_dir)
+    if manifest.resolve().is_relative_to(out_dir.resolve()):
+        raise ValueError("manifest '{}' would be published with '{}'".format(manifest, out_dir))
+
+    out_dir.mkdir(mode=FOLDER_MODE, parents=True, exist_ok=True)
+    stage_dir = manifest.parent
+    stage_dir.mkdir(parents=True, exist_ok=True)
+    if stage_dir.stat().st_dev != out_dir.stat().st_dev:
+        raise ValueError(
+            "'{}' is not on the filesystem of '{}', pass a --manifest there".format(
+                stage_dir, out_dir
+            )
+        )
+
+    old = _load_manifest(manifest)
+    new: dict[str, str] = {}
+    result = Published()
+
+    for rel, data in _files(root):
+        digest = new[rel] = hashlib.sha256(data).hexdigest()
+        file_path = out_dir / rel
+        if old.get(rel) == digest and file_path.is_file():
+            result.unchanged += 1
+            continue
+
+        file_path.parent.mkdir(mode=FOLDER_MODE, parents=True, exist_ok=True)
+        _write_staged(stage_dir, file_path, data)
+        result.written.append(rel)
+
+    for rel in sorted(old.keys() - new.keys()):
+        (out_dir / rel).unlink(missing_ok=True)
+        result.removed.append(rel)
+
+    if new != old:
+        write_atomic(manifest, json.dumps(new, indent=0).encode(), FILE_MODE)
+
+    return result
@@ -0,0 +1,115 @@
+import datetime as dt
+import heapq
+import math
+import os
+from collections import defaultdict
+from concurrent.futures import as_completed
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cryptography import x509
+
+from . import builder, index, worker
+from .cert_wrapper import CertWrapper
+from .meta import CertInfo
+from .root_ca import iter_ca
+
+CHUNK_SIZE = 64
+
+
+@dataclass(order=True)
+class Due:
+    exp: dt.datetime
+    path: Path = field(compare=False)
+    isCA: bool = field(compare=False)
+    info: CertInfo | None = field(default=None, compare=False)
+    err: str | None = field(default=None, compare=False)
+
+    @property
+    def new_exp(self):
+        return builder.exp(self.isCA).replace(tzinfo=dt.timezone.utc)
+
+
+def collect(root: CertWrapper, within: dt.timedelta):
+    """certs of the whole tree expiring within `within`, soonest first
+
+    certs that would get the same expiry again (i.e. until the next grid) are left out
+    """
+    deadline = dt.datetime.now(tz=dt.timezone.utc) + within
+    queue: list[Due] = []
+    issuers: dict[Path, CertWrapper] = {}
+    for cp in iter_ca(root):
+        issuers[cp.path] = cp
+        meta = cp.meta
+        for name, info in meta.certs.items():
+            if deadline <= info.exp or info.id in meta.miss:
+                continue
+
+            due = Due(info.exp, cp.path / name, info.id in meta.ca)
+            if due.exp < due.new_exp:
+                heapq.heappush(queue, due)
+
+    return [heapq.heappop(queue) for _ in range(len(queue))], issuers
+
+
+# --- worker side ---
+def _renew_chunk(issuer_path: Path, dues: list[Due]):
+    issuer = worker.issuer(issuer_path)
+
+    certs: list[tuple[Path, x509.Certificate]] = []
+    for due in dues:
+        try:
+            cp = issuer.get_child(due.path.name)
+            cp.read()
+            cp.cert = issuer.sign(cp.renewal_csr())
+            cp.dump()
+
+            due.info = CertInfo(cp.cert.serial_number, cp.cert.not_valid_after_utc)
+            certs.append((cp.path, cp.cert))
+
+        except Exception as e:
+            due.err = str(e)
+
+    index.record(certs)
+
+    return dues
+
+
+# --- main side ---
+def renew(issuers: dict[Path, CertWrapper], dues: list[Due], workers: int | None = None):
+    workers = workers or os.cpu_count() or 1
+
+    # grouped per ca, in the order of their soonest expiring cert
+    groups: dict[Path, list[Due]] = defaultdict(list)
+    for due in dues:
+        groups[due.path.parent].append(due)
+
+    results: dict[Path, list[Due]] = defaultdict(list)
+    with worker.pool(workers) as pool:
+        futures = []
+        for issuer_path, group in groups.items():
+            size = min(CHUNK_SIZE, math.ceil(len(group) / workers))
+            for i in range(0, len(group), size):
+                futures.append(pool.submit(_renew_chunk, issuer_path, group[i : i + size]))
+
+        for future in as_completed(futures):
+            for due in future.result():
+                results[due.path.parent].append(due)
+
+    # one meta update per ca
+    renewed = {due.path: due for group in results.values() for due in group}
+    for issuer_path, group in results.items():
+        meta = issuers[issuer_path].meta
+        for due in group:
+            if not due.info:
+                continue
+
+            old_id = meta.certs[due.path.name].id
+            meta.set_cert(due.path.name, due.info)
+            if due.isCA:
+                meta.discard("ca", old_id)
+                meta.add("ca", due.info.id)
+
+        meta.save()
+
+    return [renewed.get(due.path, due) for due in dues]
@@ -0,0 +1,243 @@
+import asyncio
+import base64
+import datetime as dt
+import hashlib
+import time
+import urllib.parse
+from collections import OrderedDict
+from contextlib import suppress
+from dataclasses import dataclass
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives import serialization as ser
+from cryptography.hazmat.primitives.asymmetric import ec, ed448, ed25519
+from cryptography.x509 import ocsp
+
+from .builder import OCSP_PATH
+from .cert_wrapper import CertWrapper
+from .meta import FILE_NAME, Meta
+from .root_ca import iter_ca
+
+LIFETIME = dt.timedelta(hours=12)
+# re-sign this long before next_update
+REFRESH = dt.timedelta(hours=2)
+TICK = 60
+# yield to the event loop every this many signatures while refreshing
+SIGN_BATCH = 256
+# memoized raw requests, those without a nonce are byte-identical for the same cert
+RAW_LIMIT = 1 << 16
+# signed responses kept, least recently asked for are dropped first
+CACHE_MAX = 1 << 17
+# ocsp requests are a few hundred bytes, larger bodies are refused unread
+BODY_MAX = 1 << 14
+
+_HASHES = {"sha1": hashes.SHA1, "sha256": hashes.SHA256}
+
+_MALFORMED = ocsp.OCSPResponseBuilder.build_unsuccessful(
+    ocsp.OCSPResponseStatus.MALFORMED_REQUEST
+).public_bytes(ser.Encoding.DER)
+_UNAUTHORIZED = ocsp.OCSPResponseBuilder.build_unsuccessful(
+    ocsp.OCSPResponseStatus.UNAUTHORIZED
+).public_bytes(ser.Encoding.DER)
+
+
+def _key_bits(cp: CertWrapper):
+    """content of the subjectPublicKey bit string, which is what ocsp hashes"""
+    pub = cp.cert.public_key()
+    if isinstance(pub, ec.EllipticCurvePublicKey):
+        return pub.public_bytes(ser.Encoding.X962, ser.PublicFormat.UncompressedPoint)
+
+    if isinstance(pub, (ed25519.Ed25519PublicKey, ed448.Ed448PublicKey)):
+        return pub.public_bytes(ser.Encoding.Raw, ser.PublicFormat.Raw)
+
+    return pub.public_bytes(ser.Encoding.DER, ser.PublicFormat.PKCS1)
+
+
+class Issuer:
+    def __init__(self, cp: CertWrapper) -> None:
+        self.cp = cp
+        self.meta_path = cp.sub_dir / FILE_NAME
+        self.mtime = 0
+        self.good: set[int] = set()
+        self.revoked: dict[int, dt.datetime] = {}
+
+        cp.key.load()
+        self.reload()
+
+    def hashes(self):
+        name = self.cp.cert.subject.public_bytes()
+        key = _key_bits(self.cp)
+        for alg in _HASHES:
+            yield alg, hashlib.new(alg, name).digest(), hashlib.new(alg, key).digest()
+
+    def reload(self):
+        mtime = self.meta_path.stat().st_mtime_ns if self.meta_path.is_file() else 0
+        if mtime == self.mtime:
+            return False
+
+        self.cp.meta = Meta.init_from(self.cp)
+        self.mtime = mtime
+        self.good = {info.id for info in self.cp.meta.certs.values()}
+        self.revoked = {info.id: info.rev or info.exp for info in self.cp.meta.crl}
+
+        return True
+
+
+@dataclass
+class Entry:
+    key: tuple[str, bytes, bytes, int]
+    der: bytes
+    refresh_at: float
+    hits: int = 0
+
+
+class Responder:
+    def __init__(self, root: CertWrapper) -> None:
+        self.issuers: dict[tuple[str, bytes, bytes], Issuer] = {}
+        for cp in iter_ca(root):
+            issuer = Issuer(cp)
+            for h in issuer.hashes():
+                self.issuers[h] = issuer
+
+        self.cache: OrderedDict[tuple[str, bytes, bytes, int], Entry] = OrderedDict()
+        self.raw: dict[bytes, Entry] = {}
+
+    def sign(self, issuer: Issuer, key: tuple[str, bytes, bytes, int]):
+        """only for serials known to the issuer, as good or revoked"""
+        alg, name_hash, key_hash, serial = key
+        now = dt.datetime.now(tz=dt.timezone.utc)
+
+        rev = issuer.revoked.get(serial)
+        status = ocsp.OCSPCertStatus.REVOKED if rev else ocsp.OCSPCertStatus.GOOD
+
+        pvt = issuer.cp.key.load()
+        resp = (
+            ocsp.OCSPResponseBuilder()
+            .add_response_by_hash(
+                name_hash, key_hash, serial, _HASHES[alg](), status, now, now + LIFETIME, rev, None
+            )
+            .responder_id(ocsp.OCSPResponderEncoding.HASH, issuer.cp.cert)
+            .sign(pvt, hashes.SHA256())
+        )
+
+        entry = Entry(
+            key,
+            resp.public_bytes(ser.Encoding.DER),
+            time.time() + (LIFETIME - REFRESH).total_seconds(),
+        )
+        self.cache[key] = entry
+        self.cache.move_to_end(key)
+        if CACHE_MAX < len(self.cache):
+            self.cache.popitem(last=False)
+
+        return entry
+
+    def respond(self, body: bytes):
+        if entry := self.raw.get(body):
+            entry.hits += 1
+            return entry.der
+
+        try:
+            req = ocsp.load_der_ocsp_request(body)
+            key = (
+                req.hash_algorithm.name,
+                req.issuer_name_hash,
+                req.issuer_key_hash,
+                req.serial_number,
+            )
+        except (ValueError, KeyError):
+            return _MALFORMED
+
+        if entry := self.cache.get(key):
+            self.cache.move_to_end(key)
+
+        else:
+            issuer = self.issuers.get(key[:3])
+            # unknown serials are not signed for, so that random ones cost neither a
+            # signature nor memory
+            if not issuer or (key[3] not in issuer.good and key[3] not in issuer.revoked):
+                return _UNAUTHORIZED
+
+            entry = self.sign(issuer, key)
+
+        entry.hits += 1
+        if not req.extensions and len(self.raw) < RAW_LIMIT:
+            self.raw[body] = entry
+
+        return entry.der
+
+    async def refresh(self):
+        while True:
+            await asyncio.sleep(TICK)
+
+            for issuer in set(self.issuers.values()):
+                if await asyncio.to_thread(issuer.reload):
+                    # revocation data changed, so its cached responses are stale
+                    ids = set(issuer.hashes())
+                    for k in [k for k in self.cache if k[:3] in ids]:
+                        self.cache.pop(k)
+
+                    # and so are the memoized requests, which `respond` checks first
+                    self.raw = {b: e for b, e in self.raw.items() if e.key[:3] not in ids}
+
+            now = time.time()
+            due = [e for e in self.cache.values() if e.refresh_at <= now]
+            for i, entry in enumerate(due, 1):
+                if entry.hits:
+                    self.sign(self.issuers[entry.key[:3]], entry.key)
+                else:
+                    # nobody asked since it was signed
+                    self.cache.pop(entry.key)
+
+                if i % SIGN_BATCH == 0:
+                    await asyncio.sleep(0)
+
+            self.raw = {b: e for b, e in self.raw.items() if self.cache.get(e.key) is e}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                method, target, _ = line.decode("latin-1").split(" ", 2)
+                headers: dict[str, str] = {}
+                while (h := await reader.readline()).strip():
+                    k, _, v = h.decode("latin-1").partition(":")
+                    headers[k.strip().lower()] = v.strip()
+
+                der = _MALFORMED
+                if method == "POST":
+                    length = int(headers["content-length"])
+                    if not 0 <= length <= BODY_MAX:
+                        writer.write(
+                            b"HTTP/1.1 413 Content Too Large\r\n"
+                            b"Content-Length: 0\r\nConnection: close\r\n\r\n"
+                        )
+                        await writer.drain()
+                        break
+
+                    der = self.respond(await reader.readexactly(length))
+
+                elif method == "GET":
+                    encoded = urllib.parse.unquote(target.removeprefix(OCSP_PATH).lstrip("/"))
+                    with suppress(ValueError):
+                        der = self.respond(base64.b64decode(encoded))
+
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\n"
+                    b"Content-Type: application/ocsp-response\r\n"
+                    b"Content-Length: %d\r\n\r\n%b" % (len(der), der)
+                )
+                await writer.drain()
+
+                if headers.get("connection", "").lower() == "close":
+                    break
+
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError, KeyError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def serve(self, host: str, port: int):
+        server = await asyncio.start_server(self.handle, host, port)
+        async with server:
+            await asyncio.gather(server.serve_forever(), self.refresh())
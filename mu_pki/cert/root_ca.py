@@ -4,8 +4,9 @@ from cryptography.hazmat.primitives import hashes
 
 from mu_pki.globals import G
 
-from . import builder
+from . import builder, index
 from .cert_wrapper import CertWrapper
+from .meta import Meta
 
 
 def load_or_init_root_ca():
@@ -15,7 +16,7 @@ def load_or_init_root_ca():
         root.load()
 
     else:
-        root.key.generate()
+        pvt = root.key.generate()
 
         csr = (
             builder.root_ca_csr()
@@ -23,7 +24,40 @@ def load_or_init_root_ca():
             .add_extension(root.key.skid, critical=False)
         )
 
-        root.cert = csr.sign(root.key.pvt, hashes.SHA256())
+        root.cert = csr.sign(pvt, hashes.SHA256())
         root.dump()
+        index.record([(root.path, root.cert)])
+        root.meta = Meta.init_from(root)
 
     return root
+
+
+def find(root: CertWrapper, path: Path):
+    """load the cert at `path`, and all of its parents"""
+    if path.parts[0] != root.name:
+        raise FileNotFoundError("Missing cert file '{}'.".format(path))
+
+    cp = root
+    for name in path.parts[1:]:
+        if not cp.isCA:
+            raise ValueError("cert '{}' is not a ca".format(cp.path))
+
+        cp = cp.get_child(name)
+        cp.load()
+
+    return cp
+
+
+def iter_ca(root: CertWrapper):
+    """walk all (recorded and present) cas of the tree, parents first"""
+    stack = [root]
+    while stack:
+        cp = stack.pop()
+        yield cp
+
+        meta = cp.meta
+        names = (n for n, i in meta.certs.items() if i.id in meta.ca and i.id not in meta.miss)
+        for name in sorted(names, reverse=True):
+            sub_cp = cp.get_child(name)
+            sub_cp.load()
+            stack.append(sub_cp)
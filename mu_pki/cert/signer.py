@@ -0,0 +1,191 @@
+import asyncio
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+
+from cryptography import x509
+from cryptography.hazmat.primitives import serialization as ser
+
+from mu_pki.globals import G
+
+from . import root_ca
+from .cert_wrapper import CertWrapper
+from .meta import FILE_NAME, Meta
+
+SOCKET_NAME = "sign.sock"
+SOCKET_MODE = 0o600
+# most csrs signed with a single meta save
+BATCH_MAX = 256
+# longest accepted request line, i.e. json with a pem csr
+LINE_LIMIT = 1 << 16
+# pending connections, deploy pipelines tend to connect all at once
+BACKLOG = 1024
+
+
+@dataclass
+class Request:
+    path: Path
+    csr: x509.CertificateSigningRequest
+    done: asyncio.Future
+
+
+def parse(line: bytes):
+    """request line: `{"path": "k1/...", "csr": "<pem>"}`"""
+    raw = json.loads(line)
+    path = Path(raw["path"])
+    if len(path.parts) < 2 or path.parts[0] != G.ROOT_NAME:
+        raise ValueError("cert path '{}' is not under '{}'".format(path, G.ROOT_NAME))
+
+    csr = x509.load_pem_x509_csr(raw["csr"].encode())
+    if not csr.is_signature_valid:
+        raise ValueError("csr for '{}' has an invalid signature".format(path))
+
+    return path, csr
+
+
+def _answer(req: Request, cert: x509.Certificate | None = None, err: Exception | None = None):
+    # the connection may have gone (and cancelled it), or it got answered already
+    if req.done.done():
+        return
+
+    if err:
+        req.done.set_exception(err)
+    else:
+        req.done.set_result(cert)
+
+
+class Issuer:
+    def __init__(self, cp: CertWrapper) -> None:
+        self.cp = cp
+        self.meta_path = cp.sub_dir / FILE_NAME
+        self.mtime = self.meta_mtime()
+        self.queue: asyncio.Queue[Request] = asyncio.Queue()
+
+    def meta_mtime(self):
+        return self.meta_path.stat().st_mtime_ns if self.meta_path.is_file() else 0
+
+    def refresh(self):
+        """pick up changes made to the meta by other processes"""
+        if self.meta_mtime() != self.mtime:
+            self.cp.meta = Meta.init_from(self.cp)
+
+    def sign(self, req: Request):
+        meta = self.cp.meta
+        cp = self.cp.get_child(req.path.name)
+        if req.path.name in meta.certs or cp.exists():
+            raise FileExistsError("Cert '{}' exists.".format(req.path))
+
+        try:
+            isCA = req.csr.extensions.get_extension_for_class(x509.BasicConstraints).value.ca
+        except x509.ExtensionNotFound:
+            isCA = False
+
+        # crls and ocsp responses of a ca are signed with its key, which must be in the store
+        if isCA:
+            raise ValueError(
+                "csr for '{}' asks for a ca, only leaf certs are signed".format(req.path)
+            )
+
+        try:
+            ekus = list(req.csr.extensions.get_extension_for_class(x509.ExtendedKeyUsage).value)
+        except x509.ExtensionNotFound:
+            ekus = [x509.ObjectIdentifier(eku) for eku in meta.ekus]
+
+        csr = cp.build_csr(False, req.csr.subject, ekus, req.csr.public_key())  # type: ignore
+        cp.cert = self.cp.sign_csr(cp.path, csr)
+        cp.dump()
+
+        return cp.cert
+
+    async def drain(self):
+        while True:
+            reqs = [await self.queue.get()]
+            # let the requests arriving meanwhile join this batch
+            await asyncio.sleep(0)
+            while len(reqs) < BATCH_MAX and not self.queue.empty():
+                reqs.append(self.queue.get_nowait())
+
+            # answered once the meta is saved, and whatever fails, so that no client hangs
+            signed: list[tuple[Request, x509.Certificate]] = []
+            try:
+                self.refresh()
+                with self.cp.meta.batch():
+                    for req in reqs:
+                        try:
+                            signed.append((req, self.sign(req)))
+                        except Exception as e:
+                            _answer(req, err=e)
+
+                self.mtime = self.meta_mtime()
+                for req, cert in signed:
+                    _answer(req, cert)
+
+            except Exception as e:
+                # e.g. a broken meta.toml, or a failed save
+                for req in reqs:
+                    _answer(req, err=e)
+
+
+class Signer:
+    def __init__(self, root: CertWrapper) -> None:
+        self.root = root
+        self.issuers: dict[Path, Issuer] = {}
+        self.tasks: set[asyncio.Task] = set()
+
+    def issuer(self, path: Path):
+        if (issuer := self.issuers.get(path)) is None:
+            cp = root_ca.find(self.root, path)
+            if not cp.isCA:
+                raise ValueError("cert '{}' is not a ca".format(path))
+
+            # decrypt the key now, instead of within the first batch
+            cp.key.load()
+            issuer = self.issuers[path] = Issuer(cp)
+            task = asyncio.create_task(issuer.drain())
+            self.tasks.add(task)
+
+        return issuer
+
+    async def sign(self, line: bytes):
+        try:
+            path, csr = parse(line)
+            issuer = self.issuer(path.parent)
+        except Exception as e:
+            return {"err": str(e)}
+
+        req = Request(path, csr, asyncio.get_running_loop().create_future())
+        issuer.queue.put_nowait(req)
+        try:
+            cert: x509.Certificate = await req.done
+        except Exception as e:
+            return {"path": path.as_posix(), "err": str(e)}
+
+        return {"path": path.as_posix(), "cert": cert.public_bytes(ser.Encoding.PEM).decode()}
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while line := await reader.readline():
+                resp = await self.sign(line)
+                writer.write(json.dumps(resp).encode() + b"\n")
+                await writer.drain()
+
+        except (ConnectionError, ValueError):
+            pass
+
+        finally:
+            writer.close()
+
+    async def serve(self, socket_path: Path):
+        socket_path.unlink(missing_ok=True)
+        # the socket must never be reachable by others, not even briefly
+        umask = os.umask(0o777 ^ SOCKET_MODE)
+        try:
+            server = await asyncio.start_unix_server(
+                self.handle, socket_path, limit=LINE_LIMIT, backlog=BACKLOG
+            )
+        finally:
+            os.umask(umask)
+
+        async with server:
+            await server.serve_forever()
@@ -0,0 +1,210 @@
+import datetime as dt
+import os
+from concurrent.futures import FIRST_COMPLETED, Future, wait
+from dataclasses import dataclass, field
+from pathlib import Path
+
+from cryptography import x509
+from cryptography.exceptions import InvalidSignature, InvalidTag
+
+from . import safe_storage, worker
+from .cert_wrapper import CertWrapper
+from .meta import Meta
+
+CHUNK_SIZE = 512
+
+
+@dataclass(slots=True)
+class Issue:
+    path: str
+    check: str
+    detail: str
+
+
+@dataclass
+class Report:
+    cas: int = 0
+    certs: int = 0
+    issues: list[Issue] = field(default_factory=list)
+
+    def to_raw(self):
+        return {
+            "cas": self.cas,
+            "certs": self.certs,
+            "issues": [{"path": i.path, "check": i.check, "detail": i.detail} for i in self.issues],
+        }
+
+
+def check_cert(cp: CertWrapper, issuer: CertWrapper, now: dt.datetime):
+    """signature by the issuer, akid / skid, validity and the key, of a cert already read"""
+    issues: list[Issue] = []
+    path = str(cp.path)
+    cert = cp.cert
+
+    try:
+        cert.verify_directly_issued_by(issuer.cert)
+    except (ValueError, TypeError, InvalidSignature) as e:
+        issues.append(Issue(path, "signature", str(e) or type(e).__name__))
+
+    try:
+        skid = cert.extensions.get_extension_for_class(x509.SubjectKeyIdentifier).value
+        if skid != x509.SubjectKeyIdentifier.from_public_key(cert.public_key()):  # type: ignore
+            issues.append(Issue(path, "skid", "does not match the public key"))
+    except x509.ExtensionNotFound:
+        issues.append(Issue(path, "skid", "missing"))
+
+    if cp is not issuer:
+        akid = cp.akid
+        if not akid or akid.key_identifier != issuer.skid.key_identifier:
+            issues.append(Issue(path, "akid", "does not match the skid of the issuer"))
+
+        if issuer.cert.not_valid_after_utc < cert.not_valid_after_utc:
+            issues.append(Issue(path, "validity", "outlives its issuer"))
+
+    if cert.not_valid_after_utc < now:
+        issues.append(Issue(path, "validity", f"expired {cert.not_valid_after_utc:%Y-%m-%d}"))
+
+    elif now < cert.not_valid_before_utc:
+        issues.append(Issue(path, "validity", f"not before {cert.not_valid_before_utc:%Y-%m-%d}"))
+
+    key_path = cp.key.file_path
+    if not key_path.is_file():
+        # leaves signed from a csr keep their key elsewhere, cas need theirs to sign
+        if cp.isCA:
+            issues.append(Issue(path, "key", "missing"))
+
+        return issues
+
+    try:
+        with key_path.open("rb") as fp:
+            pvt, _ = safe_storage.read_key(fp, cp.skid.key_identifier)
+
+        if pvt.public_key() != cert.public_key():
+            issues.append(Issue(path, "key", "does not match the cert"))
+
+    except InvalidTag:
+        # encrypted bound to the skid of another cert
+        issues.append(Issue(path, "key", "does not match the cert"))
+
+    except Exception as e:
+        issues.append(Issue(path, "key", f"unreadable: {str(e) or type(e).__name__}"))
+
+    return issues
+
+
+def check_meta(ca: CertWrapper):
+    """`meta.toml` of the ca against its certs, returns the issues and the names to check"""
+    issues: list[Issue] = []
+    meta = ca.meta
+    existing = meta.list_dir().keys()
+    cas = set(meta.ca)
+    missing = set(meta.miss)
+
+    for name, info in meta.certs.items():
+        if name not in existing and info.id not in missing:
+            issues.append(Issue(str(ca.path / name), "meta", "recorded, but the cert is missing"))
+
+    for id in cas - {info.id for info in meta.certs.values()}:
+        issues.append(Issue(str(ca.path), "meta", f"ca {id:x} is not recorded"))
+
+    # unrecorded certs, serials and ca flags are checked once the certs are read
+    return issues, sorted(existing)
+
+
+# --- worker side ---
+_cas: dict[Path, tuple[CertWrapper, set[int]]] = {}
+
+
+def _ca(path: Path):
+    """ca at `path` with its meta, read once per worker, without the (side effects of) `load`"""
+    if (cached := _cas.get(path)) is None:
+        if len(path.parts) == 1:
+            ca = CertWrapper(path, path.name)
+        else:
+            ca = CertWrapper(path.parent, path.parent.name).get_child(path.name)
+
+        ca.read()
+        ca.meta = Meta.init_from(ca)
+        cached = _cas[path] = ca, {info.id for info in ca.meta.crl}
+
+    return cached
+
+
+def _check_ca(path: Path):
+    ca, _ = _ca(path)
+    return check_meta(ca)
+
+
+def _check_chunk(ca_path: Path, names: list[str], now: dt.datetime):
+    """issues of the certs, and which of them are cas, to be walked next"""
+    ca, revoked = _ca(ca_path)
+    meta = ca.meta
+
+    issues: list[Issue] = []
+    sub_cas: list[Path] = []
+    for name in names:
+        cp = ca.get_child(name)
+        try:
+            cp.read()
+        except Exception as e:
+            issues.append(Issue(str(cp.path), "read", str(e) or type(e).__name__))
+            continue
+
+        issues += check_cert(cp, ca, now)
+
+        id = cp.cert.serial_number
+        if (info := meta.certs.get(name)) is None:
+            # revoked certs are dropped from the records, but their files stay
+            if id not in revoked:
+                issues.append(Issue(str(cp.path), "meta", "present, but not recorded"))
+
+        elif info.id != id:
+            issues.append(Issue(str(cp.path), "meta", f"recorded serial {info.id:x}, not {id:x}"))
+
+        elif (id in meta.ca) != cp.isCA:
+            issues.append(Issue(str(cp.path), "meta", "ca flag does not match the cert"))
+
+        if cp.isCA:
+            sub_cas.append(cp.path)
+
+    return issues, len(names), sub_cas
+
+
+# --- main side ---
+def verify(root: CertWrapper, workers: int | None = None):
+    """check every cert of the tree, one task per ca, then per chunk of its certs
+
+    the tree is walked as the tasks complete, so the cas of the next level are checked while
+    the certs of the previous one still are
+    """
+    now = dt.datetime.now(tz=dt.timezone.utc)
+    workers = workers or os.cpu_count() or 1
+    report = Report(certs=1, issues=check_cert(root, root, now))
+
+    with worker.pool(workers) as pool:
+        # future -> (ca path, whether it checks the meta of the ca, or a chunk of its certs)
+        pending: dict[Future, tuple[Path, bool]] = {
+            pool.submit(_check_ca, root.path): (root.path, True)
+        }
+        while pending:
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                ca_path, is_meta = pending.pop(future)
+                if is_meta:
+                    issues, names = future.result()
+                    report.cas += 1
+                    report.issues += issues
+                    for i in range(0, len(names), CHUNK_SIZE):
+                        chunk = names[i : i + CHUNK_SIZE]
+                        pending[pool.submit(_check_chunk, ca_path, chunk, now)] = ca_path, False
+
+                    continue
+
+                issues, count, sub_cas = future.result()
+                report.certs += count
+                report.issues += issues
+                for sub_path in sub_cas:
+                    pending[pool.submit(_check_ca, sub_path)] = sub_path, True
+
+    report.issues.sort(key=lambda i: (i.path, i.check))
+    return report
@@ -0,0 +1,35 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from mu_pki.globals import G
+
+from .cert_wrapper import CertWrapper
+
+_issuers: dict[Path, CertWrapper] = {}
+
+
+def _init(root_dir: Path):
+    G.ROOT_DIR = root_dir
+
+
+def pool(workers: int | None = None):
+    """process pool for signing, workers share the store of the main process"""
+    return ProcessPoolExecutor(workers or os.cpu_count(), initializer=_init, initargs=(G.ROOT_DIR,))
+
+
+def issuer(path: Path):
+    """ca at `path` with its key loaded, once per worker"""
+    if (cp := _issuers.get(path)) is None:
+        # only the cert and the key are needed for signing, the meta is owned by the main process
+        if len(path.parts) == 1:
+            cp = CertWrapper(path, path.name)
+        else:
+            # the parent is only there to find the cert in its pack
+            cp = CertWrapper(path.parent, path.parent.name).get_child(path.name)
+
+        _issuers[path] = cp
+        cp.read()
+        cp.key.load()
+
+    return cp
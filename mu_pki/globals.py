@@ -5,7 +5,6 @@ from pathlib import Path
 
 from cryptography.hazmat.primitives.asymmetric import ec
 from dotenv import load_dotenv
-from wcwidth import wcswidth
 
 load_dotenv()
 
@@ -23,7 +22,19 @@ class G:
     T_ORIGIN = dt.datetime(year=2000, month=T_MONTH, day=T_DAY, tzinfo=dt.timezone.utc)
 
     ENC_KEY = base64.b64decode(os.getenv("ENC_KEY", ""))
+    # decrypted keys are dropped once unused for this many seconds, 0 keeps them on their cert
+    KEY_TTL = float(os.getenv("KEY_TTL", "900"))
+    KEY_CACHE_SIZE = int(os.getenv("KEY_CACHE_SIZE", "64"))
+    # keys pre-generated for new certs, refilled while idle, 0 to generate them on demand
+    KEY_POOL = int(os.getenv("KEY_POOL", "0"))
+    KEY_POOL_DIR = Path(os.environ["KEY_POOL_DIR"]) if os.getenv("KEY_POOL_DIR") else None
+
+    # keep a store-wide sqlite index of issued certs
+    INDEX = os.getenv("INDEX", "0") == "1"
+
+    # time the hot paths, exported on exit to `TRACE_DIR` (default: the store)
+    TRACE = os.getenv("TRACE", "0") == "1"
+    TRACE_DIR = Path(os.environ["TRACE_DIR"]) if os.getenv("TRACE_DIR") else None
 
     COL_SPACER = "  "
     IDX_SPACER = ". "
-    IDENT = wcswidth(COL_SPACER) // 2 + 1
@@ -4,31 +4,62 @@ from wcwidth import wcswidth
 
 from mu_pki.globals import G
 
-stdscr = curses.initscr()
+IDENT = wcswidth(G.COL_SPACER) // 2 + 1
 
 
 class Display:
-    def __init__(self) -> None:
+    def __getattr__(self, name: str):
+        # the screen is only set up on first use, so that importing doesn't take over the terminal
+        if name.startswith("_") or "screen" in self.__dict__:
+            raise AttributeError(name)
+
+        self.setup()
+        return getattr(self, name)
+
+    def setup(self):
+        stdscr = curses.initscr()
+        # escape is a key of its own, not only the start of a sequence
+        curses.set_escdelay(25)
         max_h, max_w = stdscr.getmaxyx()
         max_w -= 4
         max_h -= 2
 
         self.screen = curses.newwin(max_h, max_w, 1, 2)
+        # page up/down as single keys
+        self.screen.keypad(True)
         self.max_w = max_w - 2
         self.max_h = max_h - 2
-        self.box_w = self.max_w - 2 * G.IDENT - 4
+        self.box_w = self.max_w - 2 * IDENT - 4
         self.div = f"├{'┄' * (self.max_w)}┤"
         self.footer_div = f"├{'─' * (self.max_w)}┤"
 
         self.box = self.new_box(1)
+        # (key, result) of the view drawn by `show_cert`, None once drawn over
+        self.view: tuple | None = None
+
+    def close(self):
+        if "screen" in self.__dict__:
+            curses.endwin()
 
     def add_line(self, line: str, x: int = 0):
         self.screen.addstr(self.line_no, x, line)
         self.line_no += 1
 
+    def refresh(self):
+        """only the cells changed since the last update are sent to the terminal"""
+        self.screen.noutrefresh()
+        curses.doupdate()
+
+    def restore(self):
+        """repaint what boxes covered"""
+        self.screen.touchwin()
+        self.refresh()
+
     def clear(self):
+        """erased instead of cleared, so that unchanged cells are not sent again"""
         self.line_no = 1
-        self.screen.clear()
+        self.view = None
+        self.screen.erase()
         self.screen.border()
         curses.curs_set(0)
         curses.noecho()
@@ -42,8 +73,8 @@ class Display:
     def new_box(self, hight: int):
         y = (self.max_h - hight) // 2
 
-        box = self.screen.subwin(hight + 2, self.box_w + 2, y, G.IDENT + 4)
-        box.clear()
+        # on top of the screen instead of in it, so that what it covers could be restored
+        box = curses.newwin(hight + 2, self.box_w + 2, y, IDENT + 4)
         box.border()
 
         return box
@@ -52,26 +83,26 @@ class Display:
         lines = text.strip().split("\n")
         box = self.new_box(len(lines))
         for i, line in enumerate(lines, 1):
-            box.addstr(i, G.IDENT, line)
+            box.addstr(i, IDENT, line)
 
         box.refresh()
 
         box.getch()
 
-        box.clear()
         del box
+        self.restore()
 
     def show_input_state(self, prompt: str, buff: list[str], expected_len: int = 0):
-        self.box.clear()
+        self.box.erase()
         self.box.border()
 
-        self.box.addstr(0, G.IDENT, f" [ {prompt} ] ")
+        self.box.addstr(0, IDENT, f" [ {prompt} ] ")
         # TODO: wch support
         self.box.addnstr(
             1,
-            G.IDENT,
-            "".join(buff[-(self.box_w - G.IDENT) :]),
-            self.box_w - G.IDENT,
+            IDENT,
+            "".join(buff[-(self.box_w - IDENT) :]),
+            self.box_w - IDENT,
         )
         if expected_len and (current_len := len(buff)) < expected_len:
             self.box.addstr("_" * (expected_len - current_len))
@@ -36,6 +36,10 @@ class Item:
     def text(self):
         return self._text
 
+    @property
+    def search_text(self):
+        return self._text
+
 
 class ChoiceItem(Item):
     ON = "[X] "
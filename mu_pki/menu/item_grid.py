@@ -5,8 +5,7 @@ from wcwidth import wcswidth
 
 from mu_pki.globals import G
 
-from . import stats
-from .display import Display
+from .display import IDENT, Display
 from .item_provider import ItemProvider
 
 # ---
@@ -63,78 +62,125 @@ class ItemGrid:
 
         self.hight: int
         self.plns: list[WPln]
+        # first item of each page, only the current one is planned and rendered
+        self.pages: list[int] = [0]
+        self.page = 0
+        # first line, for re-rendering in place
+        self.y0 = 0
+        self._key: tuple = ()
 
-    def plan_col(self, h: int = 0, is_fixed: bool = False):
+    @property
+    def page_range(self):
+        start = self.pages[self.page]
+        if self.page + 1 < len(self.pages):
+            return start, self.pages[self.page + 1]
+
+        return start, len(self.itp.items)
+
+    def _col(self, start: int, end: int):
+        spans = self.itp.spans
+        return WPln(
+            spans.max(start, end),
+            spans.ci(start, end),
+            math.ceil(math.log10(end + 1)) if self.has_idx else 0,
+            (IDX_EX if self.has_idx else 0),
+            COL_EX,
+        )
+
+    def _cols(self, start: int, stop: int, h: int):
+        """columns of `h` for the items in [start, stop), None if they overflow the width"""
+        plns: list[WPln] = []
+        w = 0.0
+        for col_start in range(start, stop, h):
+            plns.append(pln := self._col(col_start, min(col_start + h, stop)))
+            w += pln.raw_tot
+            # a single column too wide is truncated instead
+            if self.max_w < w and (start < col_start or col_start + h < stop):
+                return None
+
+        return plns
+
+    def _explore(self, start: int, stop: int, h: int, is_fixed: bool):
+        """sets `hight`, the lowest fitting (widths only grow with more, narrower, columns)"""
+        if not is_fixed:
+            h = self.max_h
+            if self._cols(start, stop, h) is None:
+                return None
+
+            lo = 1
+            while lo < h:
+                mid = (lo + h) // 2
+                if self._cols(start, stop, mid) is None:
+                    lo = mid + 1
+                else:
+                    h = mid
+
+        self.hight = h
+        return self._cols(start, stop, h)
+
+    def _paginate(self, h: int):
+        """split into pages of as many full columns of `h` items as fit the width"""
         item_cnt = len(self.itp.items)
+        pages: list[int] = []
+        start = 0
+        while start < item_cnt:
+            pages.append(start)
+            w = 0.0
+            end = start
+            while end < item_cnt:
+                tot = self._col(end, min(end + h, item_cnt)).raw_tot
+                if start < end and self.max_w < w + tot:
+                    break
+
+                w += tot
+                end = min(end + h, item_cnt)
+
+            start = end
 
-        # --- predict ---
+        return pages
+
+    def plan_col(self, h: int = 0, is_fixed: bool = False):
+        """`h` only matters if fixed, cached in the provider until its items change"""
         if h <= 0:
-            avg_w = (
-                stats.ci([i.len for i in self.itp.items], avg_only=True)
-                + stats.predict_index_avg_len(item_cnt)
-                + IDX_EX
-                + COL_EX
-            )
-            h = math.ceil(item_cnt / (self.max_w / avg_w))
-
-        h = min(h, self.max_h)
-
-        # --- explore & backtrack ---
-        last_successful_result: list[WPln] | None = None
-        while True:
-            self.plns = []
-            col_cnt = math.ceil(item_cnt / h)
-            for i in range(col_cnt - 1):
-                end = h * (i + 1)
-                item_widths = [i.len for i in self.itp[end - h : end]]
-                self.plns.append(
-                    WPln(
-                        max(item_widths),
-                        stats.ci(item_widths),
-                        math.ceil(math.log10(end + 1)) if self.has_idx else 0,
-                        (IDX_EX if self.has_idx else 0),
-                        COL_EX,
-                    )
-                )
-
-            item_widths = [i.len for i in self.itp[h * (col_cnt - 1) :]]
-            self.plns.append(
-                WPln(
-                    max(item_widths),
-                    stats.ci(item_widths),
-                    math.ceil(math.log10(item_cnt + 1)) if self.has_idx else 0,
-                    (IDX_EX if self.has_idx else 0),
-                    COL_EX,
-                )
-            )
-
-            if sum(pln.raw_tot for pln in self.plns) <= self.max_w:
-                if is_fixed or h == 1:
-                    break
+            is_fixed = False
 
-                last_successful_result = self.plns
-                h -= 1
-                continue
+        h = min(h, self.max_h) if is_fixed else self.max_h
+        self._key = (self.max_w, self.max_h, self.has_idx, h, is_fixed)
+        plans = self.itp.plans
+        if (plan := plans.get(self._key)) is None:
+            if (plns := self._explore(0, len(self.itp.items), h, is_fixed)) is not None:
+                plans[self._key + (0,)] = self._spread(plns)
+                pages = [0]
 
-            h += 1
-            if last_successful_result:
-                self.plns = last_successful_result
-                break
+            else:
+                # page through the items at the largest height available
+                pages = self._paginate(h)
 
-            if (not is_fixed) and (h <= self.max_h):
-                continue
+            plan = plans[self._key] = (pages, self.hight if len(pages) == 1 else h)
 
-            raise NotImplementedError("Paging required")
+        self.pages, self.hight = plan
+        self.page = max(0, min(self.page, len(self.pages) - 1))
+        self._plan_page()
 
-        self.hight = h
+    def _plan_page(self):
+        key = self._key + (self.page,)
+        plans = self.itp.plans
+        if (plns := plans.get(key)) is None:
+            plns = self._cols(*self.page_range, self.hight)
+            assert plns is not None
+            plns = plans[key] = self._spread(plns)
+
+        self.plns = plns
 
+    def _spread(self, plns: list[WPln]):
+        col_cnt = len(plns)
         if col_cnt == 1:
-            self.plns[0].constrain_tot(self.max_w)
-            return
+            plns[0].constrain_tot(self.max_w)
+            return plns
 
         # --- scale up, shrink & spread ---
-        factor = self.max_w / sum(p.raw_tot for p in self.plns)
-        ordered_cols = sorted(self.plns, key=lambda p: p.max_item - p.raw_item)
+        factor = self.max_w / sum(p.raw_tot for p in plns)
+        ordered_cols = sorted(plns, key=lambda p: p.max_item - p.raw_item)
         pool = self.max_w
         target = pool / col_cnt
         for i, pln in enumerate(ordered_cols):
@@ -159,14 +205,39 @@ class ItemGrid:
                 pln.item += extra
                 pool -= extra
 
+        return plns
+
+    def turn(self, dp: Display, delta: int):
+        """move `delta` pages and re-render in place, returns whether the page changed"""
+        page = max(0, min(self.page + delta, len(self.pages) - 1))
+        if page == self.page:
+            return False
+
+        self.page = page
+        self._plan_page()
+
+        line_no = dp.line_no
+        dp.line_no = self.y0
+        if 1 < self.y0:
+            dp.screen.addstr(self.y0 - 1, 0, dp.div)
+
+        for y in range(self.hight):
+            dp.screen.addstr(self.y0 + y, 1, " " * dp.max_w)
+
+        self.render(dp)
+        dp.line_no = line_no
+        dp.refresh()
+        return True
+
     def render(self, dp: Display):
-        item_cnt = len(self.itp.items)
+        self.y0 = dp.line_no
+        start, stop = self.page_range
         col_cnt = len(self.plns)
         for y in range(self.hight):
-            x = G.IDENT
+            x = IDENT
             for col_no, pln in enumerate(self.plns):
-                n = col_no * self.hight + y
-                if item_cnt < n + 1:
+                n = start + col_no * self.hight + y
+                if stop < n + 1:
                     break
 
                 item = self.itp[n]
@@ -185,3 +256,8 @@ class ItemGrid:
                     dp.screen.addstr(dp.line_no, x - COL_EX, G.COL_SPACER)
 
             dp.line_no += 1
+
+        if 1 < len(self.pages) and 1 < self.y0:
+            # on the divider above
+            label = f" {self.page + 1}/{len(self.pages)} "
+            dp.screen.addstr(self.y0 - 1, self.max_w - wcswidth(label) - IDENT, label)
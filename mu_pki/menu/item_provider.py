@@ -1,21 +1,92 @@
+import bisect
+from collections import OrderedDict
 from functools import cached_property
-from itertools import chain
-from typing import overload
+from operator import attrgetter
+from typing import Iterable, overload
 
+from . import stats
 from .item import ChoiceItem, Item
+from .search import SearchIndex
+
+# the order of `Item`, compared as plain strings
+SORT_KEY = attrgetter("_text")
+# filtered views kept per provider, for narrowing down and for their cached layouts
+FILTERS_MAX = 16
 
 
 class ItemProvider:
-    def __init__(self) -> None:
-        self._items: list[Item] = []
+    """items kept sorted, by bisect insertion"""
+
+    def __init__(self, items: Iterable[Item] = ()) -> None:
+        # bulk loaded with a single sort
+        self._items: list[Item] = sorted(items, key=SORT_KEY)
+        self._members = set(self._items)
+
+    def __contains__(self, item: Item):
+        return item in self._members
+
+    def index(self, item: Item):
+        if item not in self._members:
+            raise ValueError("{} is not in the provider".format(item.text))
+
+        return bisect.bisect_left(self._items, SORT_KEY(item), key=SORT_KEY)
 
     def append(self, item: Item):
-        self._items.append(item)
-        self.__dict__.pop("items", None)
+        bisect.insort(self._items, item, key=SORT_KEY)
+        self._members.add(item)
+        self.changed()
 
-    @cached_property
+    def remove(self, item: Item):
+        del self._items[self.index(item)]
+        self._members.remove(item)
+        self.changed()
+
+    def changed(self):
+        """drop everything derived from the items"""
+        for name in ("spans", "plans", "search_index", "filters"):
+            self.__dict__.pop(name, None)
+
+    @property
     def items(self):
-        return [item for item in sorted(self._items)]
+        return self._items
+
+    @cached_property
+    def spans(self):
+        return stats.Spans([item.len for item in self.items])
+
+    @cached_property
+    def plans(self) -> dict:
+        """grid layouts of the items, by terminal size and arguments"""
+        return {}
+
+    @cached_property
+    def search_index(self):
+        return SearchIndex([item.search_text for item in self.items])
+
+    @cached_property
+    def filters(self) -> OrderedDict[str, tuple["ExactItemProvider", list[int]]]:
+        return OrderedDict()
+
+    def filter(self, query: str):
+        """the items matching `query`, the same provider while unchanged"""
+        if (found := self.filters.get(query)) is not None:
+            self.filters.move_to_end(query)
+            return found[0]
+
+        # an extended query only matches among the results of the shorter one
+        within = None
+        for prev, (_, idxs) in reversed(self.filters.items()):
+            if query.startswith(prev):
+                within = idxs
+                break
+
+        idxs = self.search_index.search(query, within)
+        itp = ExactItemProvider(self.items[i] for i in idxs)
+        self.filters[query] = (itp, idxs)
+        if FILTERS_MAX < len(self.filters):
+            self.filters.popitem(last=False)
+
+        return itp
 
     @overload
     def __getitem__(self, i: slice) -> list[Item]: ...
@@ -27,37 +98,66 @@ class ItemProvider:
 
 
 class ExactItemProvider(ItemProvider):
-    @cached_property
-    def items(self):
-        return self._items
+    """items kept in the order given"""
+
+    def __init__(self, items: Iterable[Item] = ()) -> None:
+        self._items = list(items)
+        self._pos = {item: i for i, item in enumerate(self._items)}
+
+    def __contains__(self, item: Item):
+        return item in self._pos
+
+    def index(self, item: Item):
+        return self._pos[item]
+
+    def append(self, item: Item):
+        self._pos[item] = len(self._items)
+        self._items.append(item)
+        self.changed()
+
+    def remove(self, item: Item):
+        del self._items[self._pos.pop(item)]
+        self._pos = {item: i for i, item in enumerate(self._items)}
+        self.changed()
 
 
 class ChoiceItemProvider(ItemProvider):
+    """the base choices first, switched on input, then the sorted extra ones, removed on input"""
+
     def __init__(self, base: set[ChoiceItem] | None = None) -> None:
+        self.base = ExactItemProvider(sorted(base) if base else [])
+        self.extras = ItemProvider()
         super().__init__()
+        self.changed()
+
+    def __contains__(self, item: Item):
+        return item in self.base or item in self.extras
 
-        self.base = base if base else set()
-        self.__items: set[ChoiceItem] = set()
+    def index(self, item: Item):
+        if item in self.base:
+            return self.base.index(item)
+
+        return len(self.base.items) + self.extras.index(item)
 
     def append(self, item: Item):
         raise Exception("not supported")
 
     def input(self, i: int):
         item = self.items[i]
-        if i < len(self.base):
-            item.switch()
+        if i < len(self.base.items):
+            item.switch()  # type: ignore
             return
 
-        self.__items.remove(item)
-        self.__dict__.pop("items", None)
+        self.extras.remove(item)
+        self.changed()
 
     def extra(self, item: ChoiceItem):
-        if i := self.items.index(item):
-            return self.input(i)
+        if item in self:
+            return self.input(self.index(item))
 
-        self.__items.add(item)
-        self.__dict__.pop("items", None)
+        self.extras.append(item)
+        self.changed()
 
-    @cached_property
-    def items(self):  # type: ignore
-        return [item for item in chain(self.base, sorted(self.__items - self.base))]
+    def changed(self):
+        self._items = self.base.items + self.extras.items
+        super().changed()
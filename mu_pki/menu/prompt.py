@@ -0,0 +1,63 @@
+from cryptography import x509
+from cryptography.x509.oid import ExtendedKeyUsageOID, ObjectIdentifier
+
+from mu_pki.cert import builder
+
+from .item import ChoiceItem, Item
+from .item_provider import ChoiceItemProvider, ItemProvider
+from .select import sel_menu, sel_sl, sel_sl_with_default
+from .show import show_ekus
+
+
+def sub(name: str, isCA: bool | None) -> x509.Name:
+    return builder.subject(sel_sl_with_default("CN", builder.default_cn(name, isCA)))
+
+
+class EkuChoiceItem(ChoiceItem):
+    def __init__(self, text: str, init_state: bool) -> None:
+        self.__oid = ObjectIdentifier(text)
+        text = f"{self.__oid.dotted_string} ({self.__oid._name})"
+        super().__init__(text, init_state)
+
+
+_COMMON_EKU = {
+    ExtendedKeyUsageOID.SERVER_AUTH,
+    ExtendedKeyUsageOID.CLIENT_AUTH,
+    ExtendedKeyUsageOID.CODE_SIGNING,
+    ExtendedKeyUsageOID.EMAIL_PROTECTION,
+    ExtendedKeyUsageOID.TIME_STAMPING,
+    ExtendedKeyUsageOID.OCSP_SIGNING,
+    ExtendedKeyUsageOID.SMARTCARD_LOGON,
+    ExtendedKeyUsageOID.KERBEROS_PKINIT_KDC,
+    ExtendedKeyUsageOID.IPSEC_IKE,
+    ExtendedKeyUsageOID.BUNDLE_SECURITY,
+    ExtendedKeyUsageOID.CERTIFICATE_TRANSPARENCY,
+}
+
+COMMON_EKU = {EkuChoiceItem(eku.dotted_string, False) for eku in _COMMON_EKU}
+_EKU_OPT = {"a", "y"}
+
+
+def eku(init_ekus: list[str]):
+    opt_itp = ItemProvider()
+    opt_itp.append(Item("a - add extra"))
+    opt_itp.append(Item("y - confirm"))
+
+    ekus_itp = ChoiceItemProvider(COMMON_EKU)  # type: ignore
+    for eku in init_ekus:
+        ekus_itp.extra(EkuChoiceItem(eku, True))
+
+    while True:
+        ekus_grid = show_ekus(opt_itp, ekus_itp)
+        sel = sel_menu(_EKU_OPT, ekus_itp, ekus_grid)
+
+        if sel == "y":
+            return [ObjectIdentifier(eku._text) for eku in ekus_itp.items if eku.state]
+
+        elif sel == "a":
+            oid = sel_sl("OID")
+            ekus_itp.extra(EkuChoiceItem(oid, True))
+
+        else:
+            assert isinstance(sel, int)
+            ekus_itp.input(sel)
@@ -0,0 +1,51 @@
+from typing import Iterable, Sequence
+
+# length of the indexed grams, shorter terms are matched by scanning
+GRAM = 3
+
+
+def _grams(text: str):
+    return {text[i : i + GRAM] for i in range(len(text) - GRAM + 1)}
+
+
+class SearchIndex:
+    """trigram postings over the lowercased texts, for finding those containing every term
+
+    candidates are those having all the grams of the longest term, which are then checked
+    """
+
+    def __init__(self, texts: Sequence[str]) -> None:
+        self.texts = [text.lower() for text in texts]
+        self.postings: dict[str, list[int]] = {}
+        for i, text in enumerate(self.texts):
+            for gram in _grams(text):
+                self.postings.setdefault(gram, []).append(i)
+
+    def _candidates(self, term: str) -> Iterable[int]:
+        if len(term) < GRAM:
+            return range(len(self.texts))
+
+        postings = sorted((self.postings.get(gram, []) for gram in _grams(term)), key=len)
+        found = set(postings[0])
+        for posting in postings[1:]:
+            if not found:
+                break
+
+            found.intersection_update(posting)
+
+        return sorted(found)
+
+    def search(self, query: str, within: Iterable[int] | None = None):
+        """indexes of the texts containing every whitespace separated term of `query`, in order
+
+        `within` narrows down the candidates, e.g. to the results of a prefix of the query
+        """
+        terms = query.lower().split()
+        if not terms:
+            return list(within) if within is not None else list(range(len(self.texts)))
+
+        if within is None:
+            within = self._candidates(max(terms, key=len))
+
+        texts = self.texts
+        return [i for i in within if all(term in texts[i] for term in terms)]
@@ -1,9 +1,15 @@
+import curses
 import math
-from typing import overload
+from typing import Callable, overload
 
 from mu_pki.menu.item_provider import ItemProvider
 
 from .display import dp
+from .item_grid import ItemGrid
+
+# as sent with or without keypad mode
+BACKSPACE = {"\x08", "\x7f", "KEY_BACKSPACE", curses.KEY_BACKSPACE}
+PAGE_KEYS = {"KEY_NPAGE": 1, "KEY_PPAGE": -1}
 
 
 def sel_sl(prompt: str):
@@ -13,9 +19,30 @@ def sel_sl(prompt: str):
 
         ch = dp.screen.get_wch()
         if ch == "\n" and buff:
+            dp.restore()
             return "".join(buff).strip()
 
-        if ch == "\x08" and buff:
+        if ch in BACKSPACE and buff:
+            buff.pop()
+
+        elif isinstance(ch, str) and ch.isprintable():
+            buff.append(ch)
+
+
+def sel_filter(query: str, show: Callable[[str], object]):
+    """edit `query`, showing the matches on every change, empty if cancelled with escape"""
+    buff = list(query)
+    while True:
+        show("".join(buff))
+
+        ch = dp.screen.get_wch()
+        if ch == "\n":
+            return "".join(buff).strip()
+
+        if ch == "\x1b":
+            return ""
+
+        if ch in BACKSPACE and buff:
             buff.pop()
 
         elif isinstance(ch, str) and ch.isprintable():
@@ -36,6 +63,7 @@ def _sel_num(length: int, init_key: str | None):
 
     while True:
         if len(buff) == length:
+            dp.restore()
             return int("".join(buff))
 
         dp.show_input_state(prompt, buff, length)
@@ -43,7 +71,7 @@ def _sel_num(length: int, init_key: str | None):
         if ch.isdigit():
             buff.append(ch)
 
-        elif ch == "\x08" and buff:
+        elif ch in BACKSPACE and buff:
             buff.pop()
 
         elif ch == "\n" and buff:
@@ -51,19 +79,24 @@ def _sel_num(length: int, init_key: str | None):
 
 
 @overload
-def sel_menu(opt: set[str], itp: None) -> str: ...
+def sel_menu(opt: set[str], itp: None, grid: None = None) -> str: ...
 @overload
-def sel_menu(opt: set[str], itp: ItemProvider) -> str | int: ...
+def sel_menu(opt: set[str], itp: ItemProvider, grid: ItemGrid | None = None) -> str | int: ...
 
 
-def sel_menu(opt, itp):
+def sel_menu(opt, itp, grid=None):
+    """`grid` of `itp`, paged in place with page up/down, indexes still address all the items"""
     max_idx = len(itp.items) - 1 if itp else None
     while True:
         ch = dp.screen.getkey()
         if ch in opt:
             return ch
 
-        if max_idx is None or not ch.isdigit():
+        if grid and ch in PAGE_KEYS:
+            grid.turn(dp, PAGE_KEYS[ch])
+            continue
+
+        if max_idx is None or max_idx < 0 or not ch.isdigit():
             continue
 
         buff_len = math.ceil(math.log10(max_idx + 2))
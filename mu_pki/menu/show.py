@@ -1,9 +1,12 @@
+from collections import OrderedDict
 from typing import TYPE_CHECKING
 
 from cryptography import x509
 from wcwidth import wcswidth
 
-from .display import dp
+from mu_pki.trace import span
+
+from .display import IDENT, dp
 from .item import Item
 from .item_grid import ItemGrid
 from .item_provider import ExactItemProvider, ItemProvider
@@ -12,8 +15,16 @@ if TYPE_CHECKING:
     from mu_pki.cert import CertWrapper
 
 
-def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider | None):
-    dp.clear()
+# info of the certs shown lately, kept as the layouts are cached in the providers
+INFOS_MAX = 64
+_infos: OrderedDict[tuple, tuple[str, ItemProvider, ItemProvider | None]] = OrderedDict()
+
+
+def _info(cp: "CertWrapper"):
+    key = (cp.path, cp.cert)
+    if (info := _infos.get(key)) is not None:
+        _infos.move_to_end(key)
+        return info
 
     akid_warn = ""
     if cp != cp.parent:
@@ -24,7 +35,6 @@ def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider
             akid_warn = " | AKId MISSMATCH"
 
     title = f" [ {cp.name}{akid_warn} ] "
-    dp.screen.addstr(0, (dp.max_w - wcswidth(title)) // 2, title)
 
     bi_itp = ExactItemProvider()
     bi_itp.append(Item(f"sub: {cp.sub}"))
@@ -34,6 +44,41 @@ def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider
     bi_itp.append(Item(f"sn: {cp.cert.serial_number:x}"))
     bi_itp.append(Item(f"sha256: {cp.sha256.hex()}"))
 
+    eku_itp: ItemProvider | None = None
+    if ekus := cp.get_ext(x509.ExtendedKeyUsage):
+        eku_itp = ItemProvider()
+        for eku in ekus:
+            eku_itp.append(Item(f"{eku.dotted_string} ({eku._name})"))
+
+    _infos[key] = info = (title, bi_itp, eku_itp)
+    if INFOS_MAX < len(_infos):
+        _infos.popitem(last=False)
+
+    return info
+
+
+@span("show_cert")
+def show_cert(
+    cp: "CertWrapper",
+    opt_itp: ItemProvider,
+    child_itp: ItemProvider | None,
+    page: int = 0,
+    query: str | None = None,
+):
+    """returns the grid of the children, for paging, `query` is shown if they are filtered
+
+    nothing is drawn if the same view is still on the screen, as providers are kept unless
+    changed, and otherwise only the changed cells are sent
+    """
+    key = (cp.path, cp.cert, opt_itp, child_itp, page, query)
+    if dp.view and dp.view[0] == key:
+        return dp.view[1]
+
+    dp.clear()
+
+    title, bi_itp, eku_itp = _info(cp)
+    dp.screen.addstr(0, (dp.max_w - wcswidth(title)) // 2, title)
+
     bi_grid = ItemGrid(dp, False, bi_itp)
     bi_grid.plan_col()
 
@@ -43,11 +88,7 @@ def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider
     y_ava = dp.max_h - bi_grid.hight - 1 - opt_grid.hight - 1
 
     eku_grid: ItemGrid | None = None
-    if ekus := cp.get_ext(x509.ExtendedKeyUsage):
-        eku_itp = ItemProvider()
-        for eku in ekus:
-            eku_itp.append(Item(f"{eku.dotted_string} ({eku._name})"))
-
+    if eku_itp:
         eku_grid = ItemGrid(dp, False, eku_itp)
         if child_itp and len(child_itp.items):
             eku_grid.plan_col()
@@ -59,6 +100,7 @@ def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider
     child_grid: ItemGrid | None = None
     if child_itp and len(child_itp.items):
         child_grid = ItemGrid(dp, True, child_itp)
+        child_grid.page = page
         child_grid.plan_col(y_ava, True)
 
     # --- rendering ---
@@ -67,6 +109,7 @@ def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider
         dp.add_line(dp.div)
         eku_grid.render(dp)
 
+    div_no = dp.line_no
     if child_grid:
         dp.add_line(dp.div)
         child_grid.render(dp)
@@ -74,10 +117,15 @@ def show_cert(cp: "CertWrapper", opt_itp: ItemProvider, child_itp: ItemProvider
     elif cp.isCA or not eku_grid:
         dp.block_with_empty(y_ava)
 
+    if query is not None:
+        dp.screen.addstr(div_no, IDENT, f" /{query} ")
+
     dp.add_line(dp.footer_div)
     opt_grid.render(dp)
 
-    dp.screen.refresh()
+    dp.refresh()
+    dp.view = (key, child_grid)
+    return child_grid
 
 
 def show_ekus(opt_itp: ItemProvider, ekus_itp: ItemProvider):
@@ -96,4 +144,5 @@ def show_ekus(opt_itp: ItemProvider, ekus_itp: ItemProvider):
     dp.add_line(dp.footer_div)
     opt_grid.render(dp)
 
-    dp.screen.refresh()
+    dp.refresh()
+    return ekus_grid
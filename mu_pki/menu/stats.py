@@ -1,5 +1,6 @@
 import math
 import statistics
+from itertools import accumulate
 from typing import Sequence
 
 # 0.95
@@ -48,27 +49,49 @@ T_DISTRIBUTION: list[float] = [
 ]
 
 
+def _ci(n: int, avg: float, var: float):
+    t = T_DISTRIBUTION[n - 1] if n <= len(T_DISTRIBUTION) else 1.960
+    return avg + (t * math.sqrt(var) / math.sqrt(n))
+
+
 def ci(clip: Sequence[int], avg_only=False):
     """+95% ci"""
     n = len(clip)
     len_avg = statistics.mean(clip)
     if 2 < n and not avg_only:
-        len_stdev = statistics.pstdev(clip)
-        t = T_DISTRIBUTION[n - 1] if n <= len(T_DISTRIBUTION) else 1.960
-
-        return len_avg + (t * len_stdev / math.sqrt(n))
+        return _ci(n, len_avg, statistics.pvariance(clip))
 
     return len_avg
 
 
-def predict_index_avg_len(n: int):
-    total = 1
-    left = n - 1
-    i = 1
-    while left > 0:
-        count = min(pow(10, i) - pow(10, i - 1), left)
-        total += i * count
-        left -= count
-        i += 1
+class Spans:
+    """max and +95% ci of any span [start, end) of `values` in O(1)
+
+    from prefix sums (of values and their squares) and a sparse table of maxes, whose rows are
+    only built up to the longest span asked for
+    """
+
+    def __init__(self, values: Sequence[int]) -> None:
+        self.sums = list(accumulate(values, initial=0))
+        self.sq_sums = list(accumulate((v * v for v in values), initial=0))
+        # maxes[k][i]: max of values[i : i + 2**k]
+        self.maxes = [list(values)]
+
+    def max(self, start: int, end: int):
+        k = (end - start).bit_length() - 1
+        while len(self.maxes) <= k:
+            prev, half = self.maxes[-1], 1 << (len(self.maxes) - 1)
+            self.maxes.append(list(map(max, prev[:-half], prev[half:])))
+
+        row = self.maxes[k]
+        return max(row[start], row[end - (1 << k)])
+
+    def ci(self, start: int, end: int):
+        n = end - start
+        total = self.sums[end] - self.sums[start]
+        if n <= 2:
+            return total / n
 
-    return total / n
+        # exact, as the sums are integers
+        var = (n * (self.sq_sums[end] - self.sq_sums[start]) - total * total) / (n * n)
+        return _ci(n, total / n, var)
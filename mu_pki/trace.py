@@ -0,0 +1,115 @@
+import atexit
+import json
+import os
+import threading
+import time
+from array import array
+from functools import wraps
+from typing import Callable, ParamSpec, TypeVar
+
+from mu_pki.globals import G
+
+PROM_NAME = "mu_pki.prom"
+TRACE_NAME = "mu_pki-trace.json"
+# the json trace keeps the first this many spans, the stats count all of them
+TRACE_EVENTS_MAX = 100_000
+QUANTILES = (0.5, 0.99)
+
+P = ParamSpec("P")
+R = TypeVar("R")
+
+_t0 = time.perf_counter_ns()
+_durations: dict[str, array] = {}
+# (name, start, duration, thread), in ns
+_events: list[tuple[str, int, int, int]] = []
+
+
+def span(name: str):
+    """time every call of the decorated function as `name`, only if `TRACE` is on
+
+    decided at decoration time, so that disabled spans cost nothing at all
+    """
+
+    def decorate(fn: Callable[P, R]) -> Callable[P, R]:
+        if not G.TRACE:
+            return fn
+
+        durations = _durations.setdefault(name, array("q"))
+
+        @wraps(fn)
+        def traced(*args: P.args, **kwargs: P.kwargs) -> R:
+            start = time.perf_counter_ns()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                duration = time.perf_counter_ns() - start
+                durations.append(duration)
+                if len(_events) < TRACE_EVENTS_MAX:
+                    _events.append((name, start - _t0, duration, threading.get_ident()))
+
+        return traced
+
+    return decorate
+
+
+def _quantile(ordered: list[int], q: float):
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def stats():
+    """name -> (count, total, {quantile: value}), in seconds"""
+    result: dict[str, tuple[int, float, dict[float, float]]] = {}
+    for name, durations in _durations.items():
+        if not durations:
+            continue
+
+        ordered = sorted(durations)
+        result[name] = (
+            len(ordered),
+            sum(ordered) / 1e9,
+            {q: _quantile(ordered, q) / 1e9 for q in QUANTILES},
+        )
+
+    return result
+
+
+def prometheus():
+    lines = [
+        "# HELP mu_pki_span_seconds time spent in instrumented mu_pki calls",
+        "# TYPE mu_pki_span_seconds summary",
+    ]
+    for name, (count, total, quantiles) in sorted(stats().items()):
+        for q, value in quantiles.items():
+            lines.append(f'mu_pki_span_seconds{{span="{name}",quantile="{q}"}} {value:.9f}')
+
+        lines.append(f'mu_pki_span_seconds_sum{{span="{name}"}} {total:.9f}')
+        lines.append(f'mu_pki_span_seconds_count{{span="{name}"}} {count}')
+
+    return "\n".join(lines) + "\n"
+
+
+def trace():
+    """in the chrome trace event format, for chrome://tracing or perfetto"""
+    pid = os.getpid()
+    events = [
+        {"name": name, "ph": "X", "ts": start / 1e3, "dur": duration / 1e3, "pid": pid, "tid": tid}
+        for name, start, duration, tid in _events
+    ]
+    return {"traceEvents": events, "displayTimeUnit": "ms"}
+
+
+def export():
+    from mu_pki.cert.meta import FILE_MODE, write_atomic
+
+    if not any(_durations.values()):
+        return
+
+    out_dir = G.TRACE_DIR or G.ROOT_DIR
+    out_dir.mkdir(parents=True, exist_ok=True)
+    # node_exporter's textfile collector must never see a partial file
+    write_atomic(out_dir / PROM_NAME, prometheus().encode(), FILE_MODE)
+    write_atomic(out_dir / TRACE_NAME, json.dumps(trace()).encode(), FILE_MODE)
+
+
+if G.TRACE:
+    atexit.register(export)
@@ -0,0 +1,149 @@
+from functools import cached_property
+from pathlib import Path
+
+from mu_pki import api
+from mu_pki.cert import CertWrapper, key_cache, key_pool
+from mu_pki.cert.meta import Meta
+from mu_pki.menu import sel_menu, show_cert
+from mu_pki.menu.display import dp
+from mu_pki.menu.item import Item
+from mu_pki.menu.item_provider import ItemProvider
+from mu_pki.menu.select import sel_filter, sel_sl
+
+_CERT_OPT = {"x", "l"}
+_CA_OPT = {"d", "n", "/"}
+
+
+class FilenameItem(Item):
+    DIR_NOTE = "@"
+    MISS_NOTE = "# "
+
+    def __init__(self, text: str, is_dir: bool, is_miss, sub: str = "") -> None:
+        self.name = text
+        self.is_dir = is_dir
+        self.is_miss = is_miss
+        self.sub = sub
+
+    @cached_property
+    def _text(self):
+        filename = f"{self.DIR_NOTE if self.is_dir else ''}{self.name}"
+        return f"{self.MISS_NOTE if self.is_miss else ''}{filename}"
+
+    @property
+    def search_text(self):
+        return f"{self.name} {self.sub}"
+
+
+def _cert_opt(cp: CertWrapper):
+    opt = set(_CERT_OPT)
+    opt_itp = ItemProvider()
+    opt_itp.append(Item("x - return"))
+    opt_itp.append(Item("l - lock all keys"))
+    if cp.isCA:
+        opt |= _CA_OPT
+        opt_itp.append(Item("d - new directory"))
+        opt_itp.append(Item("n - new item"))
+        opt_itp.append(Item("/ - search"))
+
+    if cp.key:
+        opt.add("p")
+        opt_itp.append(Item("p - print key"))
+
+    else:
+        opt.add("v")
+        opt_itp.append(Item("v - verify key"))
+
+    return opt, opt_itp
+
+
+def access_cert(cp: CertWrapper):
+    page = 0
+    # providers are kept while unchanged, so that the screen is only redrawn if needed
+    opt, opt_itp = _cert_opt(cp)
+    child_itp: ItemProvider | None = None
+    child_src: tuple[Meta, int] | None = None
+    # children shown are those matching, if not empty
+    query = ""
+    while True:
+        if ("p" in opt) != bool(cp.key):
+            opt, opt_itp = _cert_opt(cp)
+
+        if cp.isCA:
+            cp.meta.update()
+            if child_src is None or child_src[0] is not cp.meta or child_src[1] != cp.meta.version:
+                child_src = (cp.meta, cp.meta.version)
+                cas, miss = set(cp.meta.ca), set(cp.meta.miss)
+                child_itp = ItemProvider(
+                    FilenameItem(name, info.id in cas, info.id in miss, cp.meta.sub(name))
+                    for name, info in cp.meta.certs.items()
+                )
+
+        shown_itp = child_itp.filter(query) if child_itp and query else child_itp
+        child_grid = show_cert(cp, opt_itp, shown_itp, page, query or None)
+        sel = sel_menu(opt, shown_itp, child_grid)
+        if child_grid:
+            page = child_grid.page
+
+        if sel == "x":
+            return
+
+        if sel == "/" and child_itp:
+            itp = child_itp
+            query = sel_filter(
+                query, lambda q: show_cert(cp, opt_itp, itp.filter(q) if q else itp, 0, q)
+            )
+            page = 0
+            continue
+
+        if sel == "l":
+            key_cache.lock_all()
+            continue
+
+        if sel == "v":
+            cp.key.load()
+            continue
+
+        if sel == "p":
+            dp.show_notif(cp.key.pem.decode())
+            continue
+
+        if isinstance(sel, int) and shown_itp:
+            name = shown_itp[sel].name  # type: ignore
+            if cp.meta.certs[name].id in cp.meta.miss:
+                dp.show_notif(f"File for cert '{name}' is missing.")
+                continue
+
+            next_cp = cp.get_child(name)
+            next_cp.load()
+
+        else:
+            if sel == "n":
+                is_directory = False
+                name = sel_sl("cert name")
+
+            elif sel == "d":
+                is_directory = True
+                name = sel_sl("dir name")
+
+            else:
+                raise Exception()
+
+            if name in cp.meta.certs:
+                dp.show_notif(f"Cert with '{name}' already exist.")
+                continue
+
+            next_cp = cp.get_child(name)
+            next_cp.create(is_directory)
+
+        access_cert(next_cp)
+
+
+def main(root_dir: Path):
+    try:
+        root = api.open_store(root_dir)
+        key_pool.start_refill()
+
+        access_cert(root)
+
+    finally:
+        dp.close()
@@ -0,0 +1,39 @@
+import base64
+import os
+import tempfile
+import unittest
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault("ENC_KEY", base64.b64encode(bytes(16)).decode())
+
+from mu_pki import api  # noqa: E402
+from mu_pki.cert import batch, worker  # noqa: E402
+from mu_pki.cert.cert_wrapper import CertWrapper  # noqa: E402
+from mu_pki.globals import G  # noqa: E402
+
+
+class IssueChunkTest(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.addCleanup(worker._issuers.clear)
+        api.open_store(Path(self.tmp.name))
+
+    def test_failed_entry_could_be_retried(self):
+        entry = batch.Entry(Path(G.ROOT_NAME) / "web")
+        key_path = G.ROOT_DIR / f"{entry.path}.key"
+
+        with mock.patch.object(CertWrapper, "dump", side_effect=OSError("disk full")):
+            (result,) = batch._issue_chunk(entry.path.parent, [entry])
+
+        self.assertEqual(result.err, "disk full")
+        self.assertFalse(key_path.exists())
+
+        (result,) = batch._issue_chunk(entry.path.parent, [entry])
+        self.assertIsNone(result.err)
+        self.assertTrue(key_path.is_file())
+
+
+if __name__ == "__main__":
+    unittest.main()